@@ -1,7 +1,10 @@
 """
 Flask веб-админка для управления мониторингом
 """
+import hashlib
+import hmac
 import os
+import secrets
 import sys
 from functools import wraps
 from pathlib import Path
@@ -9,7 +12,7 @@ from pathlib import Path
 # Добавляем родительскую директорию в путь
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, g, make_response
 from flask_login import LoginManager, login_user, logout_user, login_required, UserMixin
 import asyncio
 
@@ -27,6 +30,58 @@ login_manager.init_app(app)
 login_manager.login_view = 'login'
 
 
+def get_config():
+    """Конфигурация, закэшированная на время одного запроса"""
+    if not hasattr(g, '_cfg'):
+        g._cfg = config_manager.get()
+    return g._cfg
+
+
+def save_config(config):
+    """Сохранение конфигурации со сбросом кэша запроса"""
+    config_manager.save(config)
+    g.pop('_cfg', None)
+
+
+@app.teardown_request
+def drop_request_config(exc=None):
+    """Сброс закэшированной конфигурации после запроса"""
+    g.pop('_cfg', None)
+
+
+def wants_json():
+    """Клиент ждет JSON вместо редиректа (fetch/XMLHttpRequest)"""
+    return (request.accept_mimetypes.best == 'application/json' or
+            request.headers.get('X-Requested-With') == 'XMLHttpRequest')
+
+
+# Уникален для процесса: после перезапуска старые ETag браузера не совпадут
+_ETAG_SALT = secrets.token_hex(4)
+
+
+def etag_cached(view):
+    """
+    Условный GET для страниц админки
+    
+    ETag строится из версии конфигурации и состояния мониторинга. Если браузер
+    прислал совпадающий If-None-Match, возвращается 304 без рендера шаблона.
+    Страницы с ожидающими flash-сообщениями всегда рендерятся.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # get() проверяет mtime файла: ручная правка config.json меняет версию
+        get_config()
+        etag = f"{_ETAG_SALT}-{config_manager.version}-{int(monitor_service.is_running())}"
+        if '_flashes' not in session and request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, max-age=0, must-revalidate'
+        return response
+    return wrapper
+
+
 class User(UserMixin):
     """Пользователь для Flask-Login"""
     def __init__(self, username):
@@ -34,21 +89,58 @@ class User(UserMixin):
         self.username = username
 
 
+def refresh_admin_username(config):
+    """Запоминание логина админа, чтобы load_user не читал конфигурацию"""
+    app.config['ADMIN_USERNAME'] = config.get('admin', {}).get('username', 'admin')
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    config = config_manager.get()
-    admin_config = config.get('admin', {})
-    if user_id == admin_config.get('username', 'admin'):
+    if 'ADMIN_USERNAME' not in app.config:
+        refresh_admin_username(get_config())
+    if user_id == app.config['ADMIN_USERNAME']:
         return User(user_id)
     return None
 
 
+# Параметры хэширования пароля админа (PBKDF2-HMAC-SHA256)
+PASSWORD_HASH_ITERATIONS = 200_000
+
+
+def hash_password(password, salt):
+    """Хэш пароля в hex"""
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt,
+                               PASSWORD_HASH_ITERATIONS).hex()
+
+
+def set_admin_password(admin_config, password):
+    """Сохранение пароля в конфигурации в виде соли и хэша"""
+    salt = secrets.token_bytes(16)
+    admin_config['password_salt'] = salt.hex()
+    admin_config['password_hash'] = hash_password(password, salt)
+    admin_config.pop('password', None)
+
+
 def check_auth(username, password):
     """Проверка авторизации"""
-    config = config_manager.get()
+    config = get_config()
     admin_config = config.get('admin', {})
-    return (username == admin_config.get('username', 'admin') and 
-            password == admin_config.get('password', 'admin123'))
+    if not username or not password:
+        return False
+    if not hmac.compare_digest(username.encode(), admin_config.get('username', 'admin').encode()):
+        return False
+    
+    if 'password_hash' in admin_config:
+        salt = bytes.fromhex(admin_config.get('password_salt', ''))
+        return hmac.compare_digest(hash_password(password, salt), admin_config['password_hash'])
+    
+    # Пароль еще хранится открытым текстом - проверяем и переводим на хэш
+    if not hmac.compare_digest(password.encode(), admin_config.get('password', 'admin123').encode()):
+        return False
+    config = config_manager.get()
+    set_admin_password(config.setdefault('admin', {}), password)
+    save_config(config)
+    return True
 
 
 # === Маршруты авторизации ===
@@ -84,9 +176,10 @@ def logout():
 
 @app.route('/')
 @login_required
+@etag_cached
 def index():
     """Главная страница"""
-    config = config_manager.get()
+    config = get_config()
     return render_template('index.html', 
                            config=config,
                            monitor_running=monitor_service.is_running())
@@ -94,6 +187,7 @@ def index():
 
 @app.route('/keywords')
 @login_required
+@etag_cached
 def keywords():
     """Управление ключевыми словами"""
     keywords_list = config_manager.get_keywords()
@@ -106,10 +200,15 @@ def add_keyword():
     """Добавление ключевого слова"""
     keyword = request.form.get('keyword', '').strip()
     if keyword:
-        if config_manager.add_keyword(keyword):
+        ok = config_manager.add_keyword(keyword)
+        if wants_json():
+            return jsonify({'ok': ok, 'keyword': keyword})
+        if ok:
             flash(f'Ключевое слово "{keyword}" добавлено', 'success')
         else:
             flash(f'Ключевое слово "{keyword}" уже существует', 'warning')
+    elif wants_json():
+        return jsonify({'ok': False, 'error': 'Пустое ключевое слово'}), 400
     return redirect(url_for('keywords'))
 
 
@@ -117,13 +216,17 @@ def add_keyword():
 @login_required
 def remove_keyword(keyword):
     """Удаление ключевого слова"""
-    if config_manager.remove_keyword(keyword):
+    ok = config_manager.remove_keyword(keyword)
+    if wants_json():
+        return jsonify({'ok': ok, 'keyword': keyword})
+    if ok:
         flash(f'Ключевое слово "{keyword}" удалено', 'success')
     return redirect(url_for('keywords'))
 
 
 @app.route('/recipients')
 @login_required
+@etag_cached
 def recipients():
     """Управление получателями"""
     recipients_list = config_manager.get_recipients()
@@ -136,11 +239,16 @@ def add_recipient():
     """Добавление получателя"""
     try:
         chat_id = int(request.form.get('chat_id', ''))
-        if config_manager.add_recipient(chat_id):
+        ok = config_manager.add_recipient(chat_id)
+        if wants_json():
+            return jsonify({'ok': ok, 'chat_id': chat_id})
+        if ok:
             flash(f'Получатель {chat_id} добавлен', 'success')
         else:
             flash(f'Получатель {chat_id} уже существует', 'warning')
     except ValueError:
+        if wants_json():
+            return jsonify({'ok': False, 'error': 'Неверный формат Chat ID'}), 400
         flash('Неверный формат Chat ID', 'error')
     return redirect(url_for('recipients'))
 
@@ -149,18 +257,22 @@ def add_recipient():
 @login_required
 def remove_recipient(chat_id):
     """Удаление получателя"""
-    if config_manager.remove_recipient(chat_id):
+    ok = config_manager.remove_recipient(chat_id)
+    if wants_json():
+        return jsonify({'ok': ok, 'chat_id': chat_id})
+    if ok:
         flash(f'Получатель {chat_id} удален', 'success')
     return redirect(url_for('recipients'))
 
 
 @app.route('/telegram')
 @login_required
+@etag_cached
 def telegram():
     """Управление Telegram каналами"""
-    channels = config_manager.get_telegram_channels()
-    config = config_manager.get()
+    config = get_config()
     tg_config = config.get('telegram', {})
+    channels = tg_config.get('channels', [])
     return render_template('telegram.html', 
                            channels=channels,
                            config=tg_config)
@@ -172,10 +284,15 @@ def add_telegram_channel():
     """Добавление Telegram канала"""
     channel = request.form.get('channel', '').strip()
     if channel:
-        if config_manager.add_telegram_channel(channel):
+        ok = config_manager.add_telegram_channel(channel)
+        if wants_json():
+            return jsonify({'ok': ok, 'channel': channel})
+        if ok:
             flash(f'Канал "{channel}" добавлен', 'success')
         else:
             flash(f'Канал "{channel}" уже существует', 'warning')
+    elif wants_json():
+        return jsonify({'ok': False, 'error': 'Пустая ссылка на канал'}), 400
     return redirect(url_for('telegram'))
 
 
@@ -183,7 +300,10 @@ def add_telegram_channel():
 @login_required
 def remove_telegram_channel(channel):
     """Удаление Telegram канала"""
-    if config_manager.remove_telegram_channel(channel):
+    ok = config_manager.remove_telegram_channel(channel)
+    if wants_json():
+        return jsonify({'ok': ok, 'channel': channel})
+    if ok:
         flash(f'Канал "{channel}" удален', 'success')
     return redirect(url_for('telegram'))
 
@@ -204,18 +324,19 @@ def update_telegram_config():
     tg_config['bot_token'] = request.form.get('bot_token', '')
     tg_config['phone'] = request.form.get('phone', '')
     
-    config_manager.save(config)
+    save_config(config)
     flash('Конфигурация Telegram обновлена', 'success')
     return redirect(url_for('telegram'))
 
 
 @app.route('/vk')
 @login_required
+@etag_cached
 def vk():
     """Управление VK группами"""
-    groups = config_manager.get_vk_groups()
-    config = config_manager.get()
+    config = get_config()
     vk_config = config.get('vk', {})
+    groups = vk_config.get('groups', [])
     return render_template('vk.html', 
                            groups=groups,
                            config=vk_config)
@@ -227,10 +348,15 @@ def add_vk_group():
     """Добавление VK группы"""
     group = request.form.get('group', '').strip()
     if group:
-        if config_manager.add_vk_group(group):
+        ok = config_manager.add_vk_group(group)
+        if wants_json():
+            return jsonify({'ok': ok, 'group': group})
+        if ok:
             flash(f'Группа "{group}" добавлена', 'success')
         else:
             flash(f'Группа "{group}" уже существует', 'warning')
+    elif wants_json():
+        return jsonify({'ok': False, 'error': 'Пустой ID группы'}), 400
     return redirect(url_for('vk'))
 
 
@@ -238,7 +364,10 @@ def add_vk_group():
 @login_required
 def remove_vk_group(group):
     """Удаление VK группы"""
-    if config_manager.remove_vk_group(group):
+    ok = config_manager.remove_vk_group(group)
+    if wants_json():
+        return jsonify({'ok': ok, 'group': group})
+    if ok:
         flash(f'Группа "{group}" удалена', 'success')
     return redirect(url_for('vk'))
 
@@ -250,16 +379,17 @@ def update_vk_config():
     config = config_manager.get()
     config.setdefault('vk', {})['access_token'] = request.form.get('access_token', '')
     
-    config_manager.save(config)
+    save_config(config)
     flash('Конфигурация VK обновлена', 'success')
     return redirect(url_for('vk'))
 
 
 @app.route('/settings')
 @login_required
+@etag_cached
 def settings():
     """Настройки мониторинга"""
-    config = config_manager.get()
+    config = get_config()
     admin_config = config.get('admin', {})
     monitoring_config = config.get('monitoring', {})
     return render_template('settings.html',
@@ -280,9 +410,10 @@ def update_admin_settings():
     if new_username:
         admin_config['username'] = new_username
     if new_password:
-        admin_config['password'] = new_password
+        set_admin_password(admin_config, new_password)
     
-    config_manager.save(config)
+    save_config(config)
+    refresh_admin_username(config)
     flash('Настройки админа обновлены', 'success')
     return redirect(url_for('settings'))
 
@@ -301,7 +432,7 @@ def update_monitoring_settings():
         flash('Неверные значения', 'error')
         return redirect(url_for('settings'))
     
-    config_manager.save(config)
+    save_config(config)
     flash('Настройки мониторинга обновлены', 'success')
     return redirect(url_for('settings'))
 
@@ -312,12 +443,13 @@ def update_monitoring_settings():
 @login_required
 def api_status():
     """API: Статус мониторинга"""
+    counts = config_manager.get_counts()
     return jsonify({
         'running': monitor_service.is_running(),
-        'keywords_count': len(config_manager.get_keywords()),
-        'recipients_count': len(config_manager.get_recipients()),
-        'telegram_channels_count': len(config_manager.get_telegram_channels()),
-        'vk_groups_count': len(config_manager.get_vk_groups())
+        'keywords_count': counts['keywords'],
+        'recipients_count': counts['recipients'],
+        'telegram_channels_count': counts['telegram_channels'],
+        'vk_groups_count': counts['vk_groups']
     })
 
 
@@ -345,9 +477,10 @@ def api_stop():
 
 @app.route('/ai')
 @login_required
+@etag_cached
 def ai_settings():
     """Настройки AI анализа"""
-    config = config_manager.get()
+    config = get_config()
     ai_config = config.get('ai', {})
     return render_template('ai.html', config=ai_config)
 
@@ -367,7 +500,7 @@ def update_ai_config():
     ai_config['model'] = request.form.get('model', 'deepseek/deepseek-r1-0528:free').strip()
     ai_config['enabled'] = request.form.get('enabled') == 'on'
     
-    config_manager.save(config)
+    save_config(config)
     
     # Обновляем анализатор если он инициализирован
     try:
@@ -396,7 +529,7 @@ def update_ai_prompt():
     if prompt:
         ai_config['prompt'] = prompt
     
-    config_manager.save(config)
+    save_config(config)
     
     # Обновляем промпт в анализаторе
     try:
@@ -423,7 +556,7 @@ def api_ai_test():
     if not text:
         return jsonify({'success': False, 'error': 'Пустой текст'})
     
-    config = config_manager.get()
+    config = get_config()
     ai_config = config.get('ai', {})
     
     if not ai_config.get('api_key'):
@@ -441,8 +574,11 @@ def api_ai_test():
         # Запускаем асинхронный анализ
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(analyzer.analyze(text))
-        loop.close()
+        try:
+            result = loop.run_until_complete(analyzer.analyze(text))
+        finally:
+            loop.run_until_complete(analyzer.close())
+            loop.close()
         
         if result.success:
             return jsonify({
@@ -459,6 +595,11 @@ def api_ai_test():
         return jsonify({'success': False, 'error': str(e)})
 
 
+# Шаблоны страниц админки (base.html подгружается через extends)
+TEMPLATE_NAMES = ("base.html", "index.html", "login.html", "keywords.html", "recipients.html",
+                  "telegram.html", "vk.html", "settings.html", "ai.html")
+
+
 def run_admin(host='0.0.0.0', port=5000, debug=False):
     """Запуск Flask сервера"""
     print(f"\nАдмин-панель запущена: http://localhost:{port}")
@@ -468,8 +609,27 @@ def run_admin(host='0.0.0.0', port=5000, debug=False):
     # Обновляем secret_key из конфигурации
     config = config_manager.get()
     app.secret_key = config.get('admin', {}).get('secret_key', app.secret_key)
+    refresh_admin_username(config)
+    
+    if debug:
+        app.run(host=host, port=port, debug=debug, threaded=True)
+        return
+    
+    # В рабочем режиме шаблоны не меняются - не проверяем их на каждом рендере
+    app.config['TEMPLATES_AUTO_RELOAD'] = False
+    app.jinja_env.auto_reload = False
     
-    app.run(host=host, port=port, debug=debug, threaded=True)
+    # Компилируем шаблоны заранее, чтобы первый запрос не платил за парсинг
+    with app.app_context():
+        for name in TEMPLATE_NAMES:
+            app.jinja_env.get_template(name)
+    
+    try:
+        from waitress import serve
+    except ImportError:
+        app.run(host=host, port=port, debug=debug, threaded=True)
+    else:
+        serve(app, host=host, port=port, threads=8)
 
 
 if __name__ == '__main__':
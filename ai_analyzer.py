@@ -2,15 +2,72 @@
 AI анализ текста через OpenRouter API
 """
 import aiohttp
+import asyncio
+import hashlib
 import logging
-from typing import Optional, Dict, Any
+import random
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Set, Tuple
 from dataclasses import dataclass
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    import json
+
 logger = logging.getLogger(__name__)
 
+if orjson is not None:
+    def _json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+    _json_loads = orjson.loads
+else:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+# Таблица экранирования HTML для сообщений Telegram (один проход по строке)
+_HTML_ESCAPE = str.maketrans({"<": "&lt;", ">": "&gt;", "&": "&amp;"})
+
+# Постоянные части блока AI-анализа в сообщении
+_HEADER = "\n\n🤖 <b>AI Анализ:</b>\n"
+_FAIL_PREFIX = _HEADER + "<i>⚠️ "
+_FAIL_SUFFIX = "</i>"
+
 # OpenRouter API endpoint
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
 
+# Параметры пула соединений к OpenRouter
+CONNECTION_LIMIT = 256
+CONNECTION_LIMIT_PER_HOST = 64
+KEEPALIVE_TIMEOUT = 60
+DNS_CACHE_TTL = 300
+REQUEST_TIMEOUT = 60
+
+# Максимальное количество закэшированных результатов анализа
+CACHE_MAX_SIZE = 1024
+
+# Максимальное количество одновременных запросов к OpenRouter
+MAX_CONCURRENT_REQUESTS = 8
+
+# Повторные попытки при 429/5xx и сетевых ошибках (экспоненциальная задержка)
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 0.5
+# Верхняя граница паузы по заголовку Retry-After (сек)
+RETRY_AFTER_MAX = 30
+
+# Сколько байт тела ответа читать при HTTP-ошибке
+ERROR_BODY_LIMIT = 512
+
+# Пакетный анализ: максимум постов в одном запросе и время набора пакета (сек)
+BATCH_SIZE = 8
+BATCH_TIMEOUT = 0.05
+
+BATCH_INSTRUCTION = """
+
+Выше {count} пронумерованных постов. Проанализируй каждый пост отдельно.
+Ответ верни строго в виде JSON-массива из {count} объектов вида {{"post": <номер поста>, "analysis": "<анализ>"}} - по одному на пост, без пояснений."""
+
 
 @dataclass
 class AIAnalysisResult:
@@ -26,7 +83,7 @@ class AIAnalyzer:
     """Анализатор текста через OpenRouter API"""
     
     def __init__(self, api_key: str, model: str = "deepseek/deepseek-r1-0528:free",
-                 prompt: str = None):
+                 prompt: str = None, batch: bool = False):
         """
         Инициализация AI-анализатора
         
@@ -34,10 +91,91 @@ class AIAnalyzer:
             api_key: API ключ OpenRouter
             model: Модель для использования
             prompt: Промпт для анализа (по умолчанию - базовый промпт)
+            batch: Объединять одновременные анализы в пакетные запросы
         """
         self.api_key = api_key
         self.model = model
         self.prompt = prompt or self._default_prompt()
+        self.batch = batch
+        self._split_prompt()
+        self._headers = self._build_headers()
+        self._payload_template = self._build_payload_template()
+        self._session: Optional[aiohttp.ClientSession] = None
+        # LRU-кэш результатов: одинаковые тексты (репосты) не анализируются повторно
+        self._cache: "OrderedDict[str, AIAnalysisResult]" = OrderedDict()
+        self._cache_max = CACHE_MAX_SIZE
+        # Ограничение параллельных запросов и объединение одинаковых запросов в полете
+        self._sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._max_retries = MAX_RETRIES
+        self._base = RETRY_BASE_DELAY
+        # Объединение одновременных вызовов analyze_coalesced() в пакеты (ai.batch)
+        self._batch_size = BATCH_SIZE
+        self._batch_timeout = BATCH_TIMEOUT
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_task: Optional[asyncio.Task] = None
+        # Запущенные пакеты: каждый выполняется отдельной задачей под self._sem
+        self._batch_runs: Set[asyncio.Task] = set()
+    
+    def _split_prompt(self):
+        """
+        Разбиение промпта на части до и после плейсхолдера {text}
+        
+        Экранированные скобки {{ и }} заменяются одинарными, как при str.format.
+        """
+        prefix, _, suffix = self.prompt.partition("{text}")
+        self._prefix = prefix.replace("{{", "{").replace("}}", "}")
+        self._suffix = suffix.replace("{{", "{").replace("}}", "}")
+    
+    def _build_headers(self) -> Dict[str, str]:
+        """Заголовки запроса (меняются только вместе с api_key)"""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://github.com/monitor-service",
+            "X-Title": "VK-TG-Monitor"
+        }
+    
+    def _build_payload_template(self) -> Dict[str, Any]:
+        """Неизменная часть тела запроса (меняется только вместе с model)"""
+        return {
+            "model": self.model,
+            "messages": [],
+            "max_tokens": 500,
+            "temperature": 0.7
+        }
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Получение общей HTTP-сессии
+        
+        Сессия создается лениво внутри работающего event loop и переиспользуется
+        между вызовами, чтобы не устанавливать TLS-соединение заново.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=CONNECTION_LIMIT,
+                limit_per_host=CONNECTION_LIMIT_PER_HOST,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=DNS_CACHE_TTL
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+                json_serialize=_json_dumps
+            )
+        return self._session
+    
+    async def close(self):
+        """Остановка пакетной обработки и закрытие HTTP-сессии"""
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            self._batch_task = None
+        for task in list(self._batch_runs):
+            task.cancel()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
     def _default_prompt(self) -> str:
         """Дефолтный промпт для анализа"""
@@ -54,13 +192,14 @@ class AIAnalyzer:
 Пост для анализа:
 {text}"""
     
-    async def analyze(self, text: str, max_length: int = 2000) -> AIAnalysisResult:
+    async def analyze(self, text: str, max_bytes: int = 4000) -> AIAnalysisResult:
         """
         Анализ текста через OpenRouter API
         
         Args:
             text: Текст для анализа
-            max_length: Максимальная длина текста для анализа
+            max_bytes: Максимальный размер текста для анализа в байтах UTF-8
+                (4000 байт ≈ 2000 символов кириллицы)
             
         Returns:
             AIAnalysisResult с результатом анализа
@@ -77,91 +216,339 @@ class AIAnalyzer:
                 error="Пустой текст для анализа"
             )
         
-        # Обрезаем текст если слишком длинный
-        text_to_analyze = text[:max_length]
-        if len(text) > max_length:
-            text_to_analyze += "..."
+        text_to_analyze = self._truncate(text, max_bytes)
+        
+        key = self._cache_key(text_to_analyze)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        
+        if key in self._inflight:
+            # Такой же текст уже анализируется - ждем тот же результат;
+            # отмена ожидающего не должна отменять общий future
+            return await asyncio.shield(self._inflight[key])
         
         # Формируем промпт
-        full_prompt = self.prompt.format(text=text_to_analyze)
+        full_prompt = self._prefix + text_to_analyze + self._suffix
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://github.com/monitor-service",
-            "X-Title": "VK-TG-Monitor"
-        }
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._do_request(full_prompt)
+            if result.success:
+                self._cache_put(key, result)
+            if not future.done():
+                future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.cancel()
+    
+    @staticmethod
+    def _truncate(text: str, max_bytes: int) -> str:
+        """Обрезка текста по байтам UTF-8 на границе символа"""
+        text_bytes = text.encode("utf-8")
+        if len(text_bytes) > max_bytes:
+            return text_bytes[:max_bytes].decode("utf-8", errors="ignore") + "..."
+        return text
+    
+    def _cache_key(self, text_to_analyze: str) -> str:
+        """Ключ кэша: модель + промпт + текст"""
+        return hashlib.sha256(
+            f"{self.model}\0{self.prompt}\0{text_to_analyze}".encode()
+        ).hexdigest()
+    
+    def _cache_put(self, key: str, result: AIAnalysisResult):
+        """Сохранение результата в LRU-кэш"""
+        self._cache[key] = result
+        if len(self._cache) > self._cache_max:
+            self._cache.popitem(last=False)
+    
+    async def analyze_batch(self, texts: List[str], max_bytes: int = 4000) -> List[AIAnalysisResult]:
+        """
+        Анализ нескольких текстов одним запросом к OpenRouter API
         
-        payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": full_prompt
-                }
-            ],
-            "max_tokens": 500,
-            "temperature": 0.7
-        }
+        Посты нумеруются и отправляются в одном сообщении, модель возвращает
+        JSON-массив анализов в том же порядке. Если ответ не удалось разобрать,
+        тексты анализируются по отдельности.
+        
+        Args:
+            texts: Тексты для анализа
+            max_bytes: Максимальный размер каждого текста в байтах UTF-8
+            
+        Returns:
+            Список AIAnalysisResult в порядке входных текстов
+        """
+        results: List[Optional[AIAnalysisResult]] = [None] * len(texts)
+        # Ключ кэша -> (обрезанный текст, индексы); одинаковые тексты отправляются один раз
+        pending: Dict[str, Tuple[str, List[int]]] = {}
+        
+        for i, text in enumerate(texts):
+            if not self.api_key or not text or not text.strip():
+                # Ошибочные случаи формирует обычный analyze()
+                results[i] = await self.analyze(text, max_bytes)
+                continue
+            text_to_analyze = self._truncate(text, max_bytes)
+            key = self._cache_key(text_to_analyze)
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                results[i] = self._cache[key]
+                continue
+            pending.setdefault(key, (text_to_analyze, []))[1].append(i)
+        
+        if len(pending) == 1:
+            _, indices = next(iter(pending.values()))
+            result = await self.analyze(texts[indices[0]], max_bytes)
+            for i in indices:
+                results[i] = result
+        elif pending:
+            items = list(pending.items())
+            posts = "\n\n".join(
+                f"=== Пост {n + 1} ===\n{text_to_analyze}"
+                for n, (_, (text_to_analyze, _)) in enumerate(items)
+            )
+            full_prompt = (self._prefix + posts + self._suffix
+                           + BATCH_INSTRUCTION.format(count=len(items)))
+            
+            batch_result = await self._do_request(full_prompt, max_tokens=500 * len(items))
+            
+            analyses = self._parse_batch(batch_result, len(items))
+            if analyses is None:
+                if batch_result.success:
+                    logger.warning("Не удалось разобрать пакетный ответ AI, анализируем посты по отдельности")
+                    fallback = await asyncio.gather(
+                        *(self.analyze(texts[indices[0]], max_bytes) for _, (_, indices) in items)
+                    )
+                else:
+                    fallback = [batch_result] * len(items)
+                for (_, (_, indices)), result in zip(items, fallback):
+                    for i in indices:
+                        results[i] = result
+            else:
+                tokens = (batch_result.tokens_used or 0) // len(items)
+                for (key, (_, indices)), analysis in zip(items, analyses):
+                    result = AIAnalysisResult(
+                        success=True,
+                        analysis=analysis,
+                        model=self.model,
+                        tokens_used=tokens
+                    )
+                    self._cache_put(key, result)
+                    for i in indices:
+                        results[i] = result
+        
+        return results
+    
+    @staticmethod
+    def _parse_batch(result: AIAnalysisResult, count: int) -> Optional[List[str]]:
+        """
+        Разбор JSON-массива анализов из пакетного ответа
         
+        Анализы сопоставляются с постами по полю post, а не по позиции в
+        массиве; если каждый пост не встречается ровно один раз, ответ
+        отбрасывается.
+        """
+        if not result.success or not result.analysis:
+            return None
+        content = result.analysis.strip()
+        # Модели часто оборачивают JSON в блок ```json ... ```
+        start, end = content.find("["), content.rfind("]")
+        if start == -1 or end <= start:
+            return None
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    OPENROUTER_API_URL,
-                    headers=headers,
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=60)
-                ) as response:
-                    
-                    if response.status == 200:
-                        data = await response.json()
+            items = _json_loads(content[start:end + 1])
+        except ValueError:
+            return None
+        if not isinstance(items, list) or len(items) != count:
+            return None
+        analyses: List[Optional[str]] = [None] * count
+        for item in items:
+            if not isinstance(item, dict) or "analysis" not in item:
+                return None
+            try:
+                n = int(item.get("post")) - 1
+            except (TypeError, ValueError):
+                return None
+            if not 0 <= n < count or analyses[n] is not None:
+                return None
+            analyses[n] = str(item["analysis"]).strip()
+        return analyses
+    
+    async def analyze_coalesced(self, text: str) -> AIAnalysisResult:
+        """
+        Анализ текста с объединением одновременных вызовов в пакеты
+        
+        Тексты, поступившие в течение BATCH_TIMEOUT, отправляются одним
+        запросом через analyze_batch(). Пакетный промпт оборачивает промпт
+        пользователя, поэтому ответ может отличаться от analyze(); режим
+        включается опцией ai.batch (см. analyze_post).
+        
+        Args:
+            text: Текст для анализа
+            
+        Returns:
+            AIAnalysisResult с результатом анализа
+        """
+        loop = asyncio.get_running_loop()
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._batch_task is None or self._batch_task.done():
+            self._batch_task = loop.create_task(self._batch_worker())
+        
+        future = loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+    
+    async def _batch_worker(self):
+        """Фоновая задача: набирает пакет из очереди и анализирует его"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._batch_timeout
+            while len(batch) < self._batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Пакет выполняется отдельной задачей: следующий набирается сразу,
+            # число одновременных запросов ограничивает self._sem
+            task = loop.create_task(self._run_batch(batch))
+            self._batch_runs.add(task)
+            task.add_done_callback(self._batch_runs.discard)
+    
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Анализ одного набранного пакета и выдача результатов ожидающим"""
+        texts = [text for text, _ in batch]
+        try:
+            results = await self.analyze_batch(texts)
+        except asyncio.CancelledError:
+            # close() отменил пакет - ожидающие не должны зависнуть
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка пакетного AI-анализа: {e}")
+            results = [AIAnalysisResult(success=False, error=f"Неожиданная ошибка: {str(e)}")] * len(batch)
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+    
+    async def analyze_post(self, text: str) -> AIAnalysisResult:
+        """
+        Анализ поста для уведомления: пакетами при ai.batch, иначе по одному
+        
+        Args:
+            text: Текст для анализа
+            
+        Returns:
+            AIAnalysisResult с результатом анализа
+        """
+        if self.batch:
+            return await self.analyze_coalesced(text)
+        return await self.analyze(text)
+    
+    @staticmethod
+    async def _read_error(response: aiohttp.ClientResponse) -> str:
+        """Чтение начала тела ошибки без буферизации всего ответа"""
+        raw = await response.content.read(ERROR_BODY_LIMIT)
+        return raw.decode("utf-8", errors="replace")
+    
+    async def _do_request(self, full_prompt: str, max_tokens: int = None) -> AIAnalysisResult:
+        """
+        Выполнение запроса к OpenRouter API
+        
+        Args:
+            full_prompt: Готовый промпт с текстом поста
+            max_tokens: Лимит токенов ответа (по умолчанию из шаблона запроса)
+            
+        Returns:
+            AIAnalysisResult с результатом анализа
+        """
+        payload = self._payload_template.copy()
+        payload["messages"] = [{"role": "user", "content": full_prompt}]
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        
+        last_error = None
+        try:
+            session = await self._get_session()
+            for attempt in range(self._max_retries):
+                delay = self._base * 2 ** attempt + random.uniform(0, 0.25)
+                # Слот занимает только сам запрос; пауза перед повтором - вне его
+                async with self._sem:
+                    try:
+                        async with session.post(
+                            OPENROUTER_API_URL,
+                            headers=self._headers,
+                            json=payload
+                        ) as response:
                         
-                        if "choices" in data and len(data["choices"]) > 0:
-                            content = data["choices"][0].get("message", {}).get("content", "")
-                            usage = data.get("usage", {})
+                            if response.status == 200:
+                                data = _json_loads(await response.read())
                             
-                            return AIAnalysisResult(
-                                success=True,
-                                analysis=content.strip(),
-                                model=self.model,
-                                tokens_used=usage.get("total_tokens", 0)
-                            )
-                        else:
-                            error_msg = data.get("error", {}).get("message", "Неизвестная ошибка")
-                            return AIAnalysisResult(
-                                success=False,
-                                error=f"API ошибка: {error_msg}"
-                            )
-                    
-                    elif response.status == 401:
-                        return AIAnalysisResult(
-                            success=False,
-                            error="Неверный API ключ OpenRouter"
-                        )
-                    
-                    elif response.status == 429:
-                        return AIAnalysisResult(
-                            success=False,
-                            error="Превышен лимит запросов к API"
-                        )
-                    
-                    else:
-                        error_text = await response.text()
-                        return AIAnalysisResult(
-                            success=False,
-                            error=f"HTTP ошибка {response.status}: {error_text[:200]}"
-                        )
+                                if "choices" in data and len(data["choices"]) > 0:
+                                    content = data["choices"][0].get("message", {}).get("content", "")
+                                    usage = data.get("usage", {})
+                                
+                                    return AIAnalysisResult(
+                                        success=True,
+                                        analysis=content.strip(),
+                                        model=self.model,
+                                        tokens_used=usage.get("total_tokens", 0)
+                                    )
+                                else:
+                                    error_msg = data.get("error", {}).get("message", "Неизвестная ошибка")
+                                    return AIAnalysisResult(
+                                        success=False,
+                                        error=f"API ошибка: {error_msg}"
+                                    )
                         
-        except aiohttp.ClientTimeout:
-            return AIAnalysisResult(
-                success=False,
-                error="Таймаут запроса к API"
-            )
-        except aiohttp.ClientError as e:
+                            elif response.status == 401:
+                                return AIAnalysisResult(
+                                    success=False,
+                                    error="Неверный API ключ OpenRouter"
+                                )
+                        
+                            elif response.status == 429:
+                                last_error = "Превышен лимит запросов к API"
+                                try:
+                                    retry_after = float(response.headers.get("Retry-After", 0))
+                                except ValueError:
+                                    retry_after = 0
+                                delay = max(min(retry_after, RETRY_AFTER_MAX), delay)
+                        
+                            elif response.status >= 500:
+                                error_text = await self._read_error(response)
+                                last_error = f"HTTP ошибка {response.status}: {error_text[:200]}"
+                        
+                            else:
+                                error_text = await self._read_error(response)
+                                return AIAnalysisResult(
+                                    success=False,
+                                    error=f"HTTP ошибка {response.status}: {error_text[:200]}"
+                                )
+                
+                    except asyncio.TimeoutError:
+                        last_error = "Таймаут запроса к API"
+                    except aiohttp.ClientError as e:
+                        last_error = f"Ошибка сети: {str(e)}"
+                
+                if attempt < self._max_retries - 1:
+                    logger.warning(f"{last_error}. Повтор через {delay:.1f} сек.")
+                    await asyncio.sleep(delay)
+            
             return AIAnalysisResult(
                 success=False,
-                error=f"Ошибка сети: {str(e)}"
+                error=last_error
             )
+                    
         except Exception as e:
             logger.error(f"Неожиданная ошибка AI-анализа: {e}")
             return AIAnalysisResult(
@@ -181,20 +568,18 @@ class AIAnalyzer:
         """
         if not result.success:
             if result.error:
-                return f"\n\n🤖 <b>AI Анализ:</b>\n<i>⚠️ {result.error}</i>"
+                return _FAIL_PREFIX + result.error + _FAIL_SUFFIX
             return ""
         
         analysis_text = result.analysis or "Не удалось проанализировать"
         
         # Экранируем HTML в анализе
-        analysis_text = analysis_text.replace('<', '&lt;').replace('>', '&gt;')
-        
-        formatted = f"\n\n🤖 <b>AI Анализ:</b>\n{analysis_text}"
+        parts = [_HEADER, analysis_text.translate(_HTML_ESCAPE)]
         
         if result.model:
-            formatted += f"\n\n<i>Модель: {result.model}</i>"
+            parts.append(f"\n\n<i>Модель: {result.model}</i>")
         
-        return formatted
+        return "".join(parts)
     
     def update_settings(self, api_key: str = None, model: str = None, prompt: str = None):
         """
@@ -207,10 +592,17 @@ class AIAnalyzer:
         """
         if api_key is not None:
             self.api_key = api_key
-        if model is not None:
+            self._headers = self._build_headers()
+        if model is not None and model != self.model:
             self.model = model
+            self._payload_template = self._build_payload_template()
+            self._cache.clear()
         if prompt is not None:
-            self.prompt = prompt if prompt.strip() else self._default_prompt()
+            new_prompt = prompt if prompt.strip() else self._default_prompt()
+            if new_prompt != self.prompt:
+                self.prompt = new_prompt
+                self._split_prompt()
+                self._cache.clear()
         
         logger.info(f"Настройки AI-анализатора обновлены. Модель: {self.model}")
 
@@ -224,7 +616,8 @@ def get_analyzer() -> Optional[AIAnalyzer]:
     return _analyzer
 
 
-def init_analyzer(api_key: str, model: str = None, prompt: str = None) -> AIAnalyzer:
+def init_analyzer(api_key: str, model: str = None, prompt: str = None,
+                  batch: bool = False) -> AIAnalyzer:
     """
     Инициализация глобального анализатора
     
@@ -232,16 +625,25 @@ def init_analyzer(api_key: str, model: str = None, prompt: str = None) -> AIAnal
         api_key: API ключ OpenRouter
         model: Модель для использования
         prompt: Промпт для анализа
+        batch: Объединять одновременные анализы в пакетные запросы
         
     Returns:
         Инициализированный анализатор
     """
     global _analyzer
     
+    if _analyzer is not None:
+        # Старая сессия принадлежит event loop мониторинга - закрываем ее там же
+        try:
+            asyncio.get_running_loop().create_task(_analyzer.close())
+        except RuntimeError:
+            pass
+    
     _analyzer = AIAnalyzer(
         api_key=api_key,
         model=model or "deepseek/deepseek-r1-0528:free",
-        prompt=prompt
+        prompt=prompt,
+        batch=batch
     )
     
     logger.info(f"AI-анализатор инициализирован. Модель: {_analyzer.model}")
@@ -264,13 +666,11 @@ async def analyze_text(text: str) -> AIAnalysisResult:
             error="AI-анализатор не инициализирован"
         )
     
-    return await _analyzer.analyze(text)
+    return await _analyzer.analyze_post(text)
 
 
 if __name__ == "__main__":
     # Тестирование
-    import asyncio
-    
     async def test():
         import os
         
@@ -289,6 +689,7 @@ if __name__ == "__main__":
         
         print("Анализируем текст...")
         result = await analyzer.analyze(test_text)
+        await analyzer.close()
         
         print(f"Успех: {result.success}")
         print(f"Анализ: {result.analysis}")
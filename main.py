@@ -5,12 +5,20 @@
 import json
 import os
 import asyncio
+import atexit
 import logging
 import threading
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 from datetime import datetime
 from pathlib import Path
 
+from monitor_common import Match
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -25,28 +33,79 @@ logger = logging.getLogger(__name__)
 # Путь к конфигурации
 CONFIG_PATH = Path(__file__).parent / 'config.json'
 
+# fdatasync есть не на всех платформах (нет в Windows)
+_fdatasync = getattr(os, 'fdatasync', os.fsync)
+O_BINARY = getattr(os, 'O_BINARY', 0)
+
+# Задержка записи конфигурации на диск: серия правок дает одну запись
+SAVE_DEBOUNCE = 0.5
+
 
 class ConfigManager:
     """Менеджер конфигурации"""
     
     def __init__(self, config_path: Path = CONFIG_PATH):
         self.config_path = config_path
-        self._lock = threading.Lock()
+        # RLock: load() при ошибке создает конфиг по умолчанию через save()
+        self._lock = threading.RLock()
         self._config: Optional[Dict] = None
+        self._mtime = 0  # st_mtime_ns файла на момент последней загрузки/сохранения
+        # st_mtime_ns версии файла, которую не удалось разобрать при перечитывании
+        self._failed_mtime: Optional[int] = None
+        self._counts: Optional[Dict[str, int]] = None
+        # Множества для O(1) проверки дубликатов (списки в JSON остаются списками)
+        self._keyword_set: Set[str] = set()
+        self._recipient_set: Set[int] = set()
+        self._channel_set: Set[str] = set()
+        self._group_set: Set[str] = set()
+        # Ссылки на подсловари telegram/vk/monitoring текущей конфигурации
+        self._sections: Dict[str, Dict] = {}
+        # Счетчик изменений конфигурации (используется для ETag в админке)
+        self.version = 0
+        # Отложенная запись: изменения копятся в памяти и сбрасываются таймером.
+        # Версия, записанная на диск, отличается от self.version - есть несохраненное
+        self._saved_version = 0
+        # Дисковые операции сериализуются отдельной блокировкой, чтобы запись
+        # и fdatasync не держали self._lock (и не блокировали запросы админки)
+        self._write_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        atexit.register(self.flush_now)
     
     def load(self) -> Dict:
         """Загрузка конфигурации"""
         with self._lock:
+            if self._dirty:
+                # Несохраненные изменения не должны потеряться при перечитывании
+                self._flush()
+            mtime = None
             try:
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    self._config = json.load(f)
-                return self._config
+                with open(self.config_path, 'rb') as f:
+                    mtime = os.fstat(f.fileno()).st_mtime_ns
+                    data = f.read()
+                config = orjson.loads(data) if orjson is not None else json.loads(data)
             except FileNotFoundError:
                 logger.warning(f"Конфигурационный файл не найден: {self.config_path}")
+                if self._config is not None:
+                    return self._config
                 return self._create_default()
-            except json.JSONDecodeError as e:
+            except ValueError as e:
                 logger.error(f"Ошибка парсинга конфигурации: {e}")
+                if self._config is not None:
+                    # Файл испорчен при ручной правке (или записан не целиком):
+                    # работаем с прежней конфигурацией и не перезаписываем файл.
+                    # Повторно этот же вариант файла не разбираем
+                    self._failed_mtime = mtime
+                    return self._config
                 return self._create_default()
+            
+            self._config = config
+            self._mtime = mtime
+            self._failed_mtime = None
+            self._rebuild_indexes(config)
+            self._update_counts(config)
+            self.version += 1
+            self._saved_version = self.version
+            return config
     
     def _create_default(self) -> Dict:
         """Создание конфигурации по умолчанию"""
@@ -78,20 +137,163 @@ class ConfigManager:
         return default
     
     def save(self, config: Dict):
-        """Сохранение конфигурации"""
+        """
+        Сохранение конфигурации
+        
+        Конфигурация сразу обновляется в памяти, а запись на диск откладывается
+        на SAVE_DEBOUNCE секунд: несколько правок подряд дают одну запись.
+        """
+        with self._lock:
+            self._config = config
+            self._rebuild_indexes(config)
+            self._commit()
+    
+    def _commit(self):
+        """Фиксация изменения текущей конфигурации и планирование записи"""
+        with self._lock:
+            self._update_counts(self._config)
+            self.version += 1
+            self._schedule_flush()
+    
+    def _schedule_flush(self):
+        """Перезапуск таймера отложенной записи"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+        self._flush_timer = threading.Timer(SAVE_DEBOUNCE, self._flush)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+    
+    @property
+    def _dirty(self) -> bool:
+        """Есть ли изменения, еще не записанные на диск"""
+        return self.version != self._saved_version
+    
+    def _flush(self):
+        """
+        Запись конфигурации на диск, если есть несохраненные изменения
+        
+        Под self._lock делается только снимок (сериализация), сама запись и
+        fdatasync выполняются вне ее: чтение и правка конфигурации в это время
+        не ждут диска.
+        """
         with self._lock:
+            version = self.version
+            if version == self._saved_version:
+                return
             try:
-                with open(self.config_path, 'w', encoding='utf-8') as f:
-                    json.dump(config, f, ensure_ascii=False, indent=2)
-                self._config = config
+                data = memoryview(self._dumps(self._config))
+            except Exception as e:
+                logger.error(f"Ошибка сохранения конфигурации: {e}")
+                return
+        
+        with self._write_lock:
+            if version <= self._saved_version:
+                # Более новый снимок уже записан другим потоком
+                return
+            tmp_path = self.config_path.with_suffix('.json.tmp')
+            try:
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | O_BINARY, 0o600)
+                try:
+                    while data:
+                        data = data[os.write(fd, data):]
+                    _fdatasync(fd)
+                finally:
+                    os.close(fd)
+                # Замена атомарна: при сбое на диске остается старый или новый файл целиком
+                os.replace(tmp_path, self.config_path)
+                self._mtime = os.stat(self.config_path).st_mtime_ns
+                self._saved_version = version
                 logger.info("Конфигурация сохранена")
             except Exception as e:
                 logger.error(f"Ошибка сохранения конфигурации: {e}")
     
+    def flush_now(self):
+        """Немедленная запись отложенных изменений (при завершении работы)"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self._flush()
+    
+    @staticmethod
+    def _dumps(config: Dict) -> bytes:
+        """Сериализация конфигурации в JSON (orjson, если установлен)"""
+        if orjson is not None:
+            return orjson.dumps(config, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(config, ensure_ascii=False, indent=2).encode('utf-8')
+    
+    def _section(self, name: str) -> Dict:
+        """
+        Подсловарь конфигурации (создается при первом обращении)
+        
+        Ссылка запоминается до следующей загрузки/замены конфигурации.
+        """
+        config = self.get()
+        section = self._sections.get(name)
+        if section is None:
+            section = self._sections[name] = config.setdefault(name, {})
+        return section
+    
+    @property
+    def telegram_section(self) -> Dict:
+        """Раздел telegram текущей конфигурации"""
+        return self._section('telegram')
+    
+    @property
+    def vk_section(self) -> Dict:
+        """Раздел vk текущей конфигурации"""
+        return self._section('vk')
+    
+    @property
+    def monitoring_section(self) -> Dict:
+        """Раздел monitoring текущей конфигурации"""
+        return self._section('monitoring')
+    
+    def _rebuild_indexes(self, config: Dict):
+        """Построение множеств для проверки дубликатов"""
+        # Конфигурация заменена целиком - старые ссылки на разделы недействительны
+        self._sections.clear()
+        self._keyword_set = {k.lower() for k in config.get('keywords', [])}
+        self._recipient_set = set(config.get('recipients', []))
+        self._channel_set = set(config.get('telegram', {}).get('channels', []))
+        self._group_set = set(config.get('vk', {}).get('groups', []))
+    
+    def _update_counts(self, config: Dict):
+        """Пересчет размеров списков (вызывается при каждой загрузке/сохранении)"""
+        self._counts = {
+            'keywords': len(config.get('keywords', [])),
+            'recipients': len(config.get('recipients', [])),
+            'telegram_channels': len(config.get('telegram', {}).get('channels', [])),
+            'vk_groups': len(config.get('vk', {}).get('groups', []))
+        }
+    
+    def get_counts(self) -> Dict[str, int]:
+        """Количество ключевых слов, получателей, каналов и групп"""
+        # get() перечитывает файл, если его изменили вручную
+        config = self.get()
+        if self._counts is None:
+            self._update_counts(config)
+        return self._counts
+    
     def get(self) -> Dict:
-        """Получение текущей конфигурации"""
+        """
+        Получение текущей конфигурации
+        
+        Файл перечитывается только если изменилось его время модификации
+        (например, config.json отредактирован вручную). Если новый файл не
+        разбирается, остается прежняя конфигурация.
+        """
         if self._config is None:
             return self.load()
+        if self._dirty:
+            # В памяти изменения новее файла
+            return self._config
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+            if mtime != self._mtime and mtime != self._failed_mtime:
+                return self.load()
+        except OSError:
+            pass
         return self._config
     
     def update(self, updates: Dict):
@@ -104,22 +306,30 @@ class ConfigManager:
     def add_keyword(self, keyword: str) -> bool:
         """Добавление ключевого слова"""
         config = self.get()
-        if keyword.lower() not in [k.lower() for k in config.get('keywords', [])]:
+        keyword_lower = keyword.lower()
+        if keyword_lower not in self._keyword_set:
             config.setdefault('keywords', []).append(keyword)
-            self.save(config)
+            self._keyword_set.add(keyword_lower)
+            self._commit()
             return True
         return False
     
     def remove_keyword(self, keyword: str) -> bool:
         """Удаление ключевого слова"""
         config = self.get()
+        keyword_lower = keyword.lower()
+        if keyword_lower not in self._keyword_set:
+            return False
         keywords = config.get('keywords', [])
         for i, k in enumerate(keywords):
-            if k.lower() == keyword.lower():
+            if k.lower() == keyword_lower:
                 keywords.pop(i)
-                self.save(config)
-                return True
-        return False
+                break
+        # В старых конфигурациях могут быть варианты слова в разном регистре
+        if not any(k.lower() == keyword_lower for k in keywords):
+            self._keyword_set.discard(keyword_lower)
+        self._commit()
+        return True
     
     def get_keywords(self) -> List[str]:
         """Получение списка ключевых слов"""
@@ -129,20 +339,20 @@ class ConfigManager:
     def add_recipient(self, chat_id: int) -> bool:
         """Добавление получателя"""
         config = self.get()
-        recipients = config.get('recipients', [])
-        if chat_id not in recipients:
-            recipients.append(chat_id)
-            self.save(config)
+        if chat_id not in self._recipient_set:
+            config.setdefault('recipients', []).append(chat_id)
+            self._recipient_set.add(chat_id)
+            self._commit()
             return True
         return False
     
     def remove_recipient(self, chat_id: int) -> bool:
         """Удаление получателя"""
         config = self.get()
-        recipients = config.get('recipients', [])
-        if chat_id in recipients:
-            recipients.remove(chat_id)
-            self.save(config)
+        if chat_id in self._recipient_set:
+            config['recipients'] = [r for r in config.get('recipients', []) if r != chat_id]
+            self._recipient_set.discard(chat_id)
+            self._commit()
             return True
         return False
     
@@ -153,52 +363,53 @@ class ConfigManager:
     # Управление Telegram каналами
     def add_telegram_channel(self, channel: str) -> bool:
         """Добавление Telegram канала"""
-        config = self.get()
-        channels = config.setdefault('telegram', {}).setdefault('channels', [])
-        if channel not in channels:
-            channels.append(channel)
-            self.save(config)
+        # Раздел берется до проверки: get() может перечитать файл и обновить индекс
+        tg_config = self.telegram_section
+        if channel not in self._channel_set:
+            tg_config.setdefault('channels', []).append(channel)
+            self._channel_set.add(channel)
+            self._commit()
             return True
         return False
     
     def remove_telegram_channel(self, channel: str) -> bool:
         """Удаление Telegram канала"""
-        config = self.get()
-        channels = config.setdefault('telegram', {}).setdefault('channels', [])
-        if channel in channels:
-            channels.remove(channel)
-            self.save(config)
+        tg_config = self.telegram_section
+        if channel in self._channel_set:
+            tg_config['channels'] = [c for c in tg_config.get('channels', []) if c != channel]
+            self._channel_set.discard(channel)
+            self._commit()
             return True
         return False
     
     def get_telegram_channels(self) -> List[str]:
         """Получение списка Telegram каналов"""
-        return self.get().get('telegram', {}).get('channels', [])
+        return self.telegram_section.get('channels', [])
     
     # Управление VK группами
     def add_vk_group(self, group: str) -> bool:
         """Добавление VK группы"""
-        config = self.get()
-        groups = config.setdefault('vk', {}).setdefault('groups', [])
-        if group not in groups:
-            groups.append(group)
-            self.save(config)
+        vk_config = self.vk_section
+        if group not in self._group_set:
+            vk_config.setdefault('groups', []).append(group)
+            self._group_set.add(group)
+            self._commit()
             return True
         return False
     
     def remove_vk_group(self, group: str) -> bool:
         """Удаление VK группы"""
-        config = self.get()
-        groups = config.setdefault('vk', {}).setdefault('groups', [])
-        if group in groups:
-            groups.remove(group)
-            self.save(config)
+        vk_config = self.vk_section
+        if group in self._group_set:
+            vk_config['groups'] = [g for g in vk_config.get('groups', []) if g != group]
+            self._group_set.discard(group)
+            self._commit()
             return True
         return False
     
     def get_vk_groups(self) -> List[str]:
         """Получение списка VK групп"""
-        return self.get().get('vk', {}).get('groups', [])
+        return self.vk_section.get('groups', [])
 
 
 class MonitorService:
@@ -212,22 +423,35 @@ class MonitorService:
         self.ai_analyzer = None
         self.running = False
         self._monitor_task = None
+        # Создаются внутри event loop мониторинга в _run_monitoring()
+        # Общий event loop мониторинга: создается один раз на процесс
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._loop_serving = False
+        self._stop_event: Optional[asyncio.Event] = None
     
     def _init_vk_monitor(self):
-        """Инициализация VK монитора"""
+        """
+        Инициализация VK монитора
+        
+        Монитор живет все время работы процесса: при перезапуске мониторинга с
+        тем же токеном используется существующий объект (его HTTP-сессия с
+        открытыми соединениями и просмотренные посты).
+        """
         try:
             from vk_monitor import VKMonitor
-            config = self.config.get()
-            token = config.get('vk', {}).get('access_token', '')
+            token = self.config.vk_section.get('access_token', '')
+            if self.vk_monitor is not None and self.vk_monitor.access_token == token:
+                return
             if token:
                 self.vk_monitor = VKMonitor(token)
                 logger.info("VK монитор инициализирован")
             else:
                 logger.warning("VK токен не настроен")
         except ImportError as e:
-            logger.warning(f"VK монитор недоступен: {e}")
+            logger.warning("VK монитор недоступен: %s", e)
         except Exception as e:
-            logger.error(f"Ошибка инициализации VK монитора: {e}")
+            logger.error("Ошибка инициализации VK монитора: %s", e)
     
     async def _init_tg_monitor(self):
         """Инициализация Telegram монитора"""
@@ -251,9 +475,9 @@ class MonitorService:
                 logger.info("Telegram нотификатор инициализирован")
             
         except ImportError as e:
-            logger.warning(f"Telegram монитор недоступен: {e}")
+            logger.warning("Telegram монитор недоступен: %s", e)
         except Exception as e:
-            logger.error(f"Ошибка инициализации Telegram монитора: {e}")
+            logger.error("Ошибка инициализации Telegram монитора: %s", e)
     
     def _init_ai_analyzer(self):
         """Инициализация AI-анализатора"""
@@ -266,16 +490,39 @@ class MonitorService:
                 self.ai_analyzer = init_analyzer(
                     api_key=ai_config.get('api_key'),
                     model=ai_config.get('model'),
-                    prompt=ai_config.get('prompt')
+                    prompt=ai_config.get('prompt'),
+                    batch=bool(ai_config.get('batch'))
                 )
                 logger.info("AI-анализатор инициализирован")
             else:
                 logger.info("AI-анализ выключен или не настроен")
                 
         except ImportError as e:
-            logger.warning(f"AI-анализатор недоступен: {e}")
+            logger.warning("AI-анализатор недоступен: %s", e)
+        except Exception as e:
+            logger.error("Ошибка инициализации AI-анализатора: %s", e)
+    
+    async def _check_vk(self, vk_groups: List[str], keywords: List[str], max_posts: int) -> List[Match]:
+        """Проверка VK групп (запросы к API идут асинхронно, без блокировки цикла)"""
+        logger.info("Проверка %s VK групп...", len(vk_groups))
+        try:
+            vk_matches = await self.vk_monitor.monitor_sources_async(vk_groups, keywords, max_posts)
+            logger.info("Найдено %s совпадений в VK", len(vk_matches))
+            return vk_matches
+        except Exception as e:
+            logger.error("Ошибка VK мониторинга: %s", e)
+            return []
+    
+    async def _check_tg(self, tg_channels: List[str], keywords: List[str], max_posts: int) -> List[Match]:
+        """Проверка Telegram каналов"""
+        logger.info("Проверка %s Telegram каналов...", len(tg_channels))
+        try:
+            tg_matches = await self.tg_monitor.monitor_channels(tg_channels, keywords, max_posts)
+            logger.info("Найдено %s совпадений в Telegram", len(tg_matches))
+            return tg_matches
         except Exception as e:
-            logger.error(f"Ошибка инициализации AI-анализатора: {e}")
+            logger.error("Ошибка Telegram мониторинга: %s", e)
+            return []
     
     async def _monitor_cycle(self):
         """Один цикл мониторинга"""
@@ -286,100 +533,142 @@ class MonitorService:
             logger.debug("Нет ключевых слов для поиска")
             return
         
-        max_posts = config.get('monitoring', {}).get('max_posts_per_check', 20)
-        all_matches = []
+        vk_cfg = config.get('vk') or {}
+        tg_cfg = config.get('telegram') or {}
+        monitoring_cfg = config.get('monitoring') or {}
+        max_posts = monitoring_cfg.get('max_posts_per_check', 20)
+        
+        # VK и Telegram проверяются параллельно: время цикла = max(VK, TG)
+        checks = []
         
-        # VK мониторинг
         if self.vk_monitor:
-            vk_groups = config.get('vk', {}).get('groups', [])
+            vk_groups = vk_cfg.get('groups', [])
             if vk_groups:
-                logger.info(f"Проверка {len(vk_groups)} VK групп...")
-                try:
-                    vk_matches = self.vk_monitor.monitor_groups(vk_groups, keywords, max_posts)
-                    all_matches.extend(vk_matches)
-                    logger.info(f"Найдено {len(vk_matches)} совпадений в VK")
-                except Exception as e:
-                    logger.error(f"Ошибка VK мониторинга: {e}")
+                checks.append(self._check_vk(vk_groups, keywords, max_posts))
         
-        # Telegram мониторинг
         if self.tg_monitor and self.tg_monitor._connected:
-            tg_channels = config.get('telegram', {}).get('channels', [])
+            tg_channels = tg_cfg.get('channels', [])
             if tg_channels:
-                logger.info(f"Проверка {len(tg_channels)} Telegram каналов...")
-                try:
-                    tg_matches = await self.tg_monitor.monitor_channels(tg_channels, keywords, max_posts)
-                    all_matches.extend(tg_matches)
-                    logger.info(f"Найдено {len(tg_matches)} совпадений в Telegram")
-                except Exception as e:
-                    logger.error(f"Ошибка Telegram мониторинга: {e}")
+                checks.append(self._check_tg(tg_channels, keywords, max_posts))
+        
+        all_matches = []
+        for matches in await asyncio.gather(*checks):
+            all_matches.extend(matches)
         
-        # Отправка уведомлений
+        # Отправка уведомлений: совпадения обрабатываются параллельно,
+        # общий темп отправок ограничивает TelegramNotifier
         if all_matches and self.tg_notifier:
             recipients = config.get('recipients', [])
             if recipients:
-                for match in all_matches:
-                    try:
-                        # AI-анализ если включен
-                        ai_result = None
-                        if self.ai_analyzer:
-                            text_to_analyze = match.get('text', '')
-                            if text_to_analyze:
-                                logger.info(f"AI-анализ поста из {match.get('source')}...")
-                                ai_result = await self.ai_analyzer.analyze(text_to_analyze)
-                        
-                        await self.tg_notifier.notify_recipients(recipients, match, ai_result)
-                        logger.info(f"Уведомление отправлено {len(recipients)} получателям")
-                    except Exception as e:
-                        logger.error(f"Ошибка отправки уведомления: {e}")
+                await asyncio.gather(*(self._notify_match(recipients, match) for match in all_matches))
+    
+    async def _notify_match(self, recipients: List[int], match: Match):
+        """AI-анализ (если включен) и отправка уведомления об одном совпадении"""
+        try:
+            ai_result = None
+            if self.ai_analyzer:
+                text_to_analyze = match.text
+                if text_to_analyze:
+                    logger.info("AI-анализ поста из %s...", match.source)
+                    ai_result = await self.ai_analyzer.analyze_post(text_to_analyze)
+            
+            await self.tg_notifier.notify_recipients(recipients, match, ai_result)
+            logger.info("Уведомление отправлено %s получателям", len(recipients))
+        except Exception as e:
+            logger.error("Ошибка отправки уведомления: %s", e)
     
     async def _run_monitoring(self):
         """Основной цикл мониторинга"""
+        self._stop_event = asyncio.Event()
+        if not self.running:
+            # stop() мог быть вызван до создания события
+            self._stop_event.set()
+        
         self._init_vk_monitor()
         await self._init_tg_monitor()
         self._init_ai_analyzer()
         
-        config = self.config.get()
-        interval = config.get('monitoring', {}).get('check_interval', 300)
+        interval = self.config.monitoring_section.get('check_interval', 300)
         
-        logger.info(f"Мониторинг запущен. Интервал проверки: {interval} сек.")
+        logger.info("Мониторинг запущен. Интервал проверки: %s сек.", interval)
         
         while self.running:
             try:
                 await self._monitor_cycle()
             except Exception as e:
-                logger.error(f"Ошибка в цикле мониторинга: {e}")
+                logger.error("Ошибка в цикле мониторинга: %s", e)
             
-            # Ждем с возможностью прерывания
-            for _ in range(interval):
-                if not self.running:
-                    break
-                await asyncio.sleep(1)
+            # Ждем до следующего цикла; stop() прерывает ожидание сразу
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
         
         # Очистка
         if self.tg_monitor:
             await self.tg_monitor.disconnect()
+        if self.vk_monitor:
+            await self.vk_monitor.close()
+        if self.tg_notifier:
+            await self.tg_notifier.close()
+        if self.ai_analyzer:
+            await self.ai_analyzer.close()
         
         logger.info("Мониторинг остановлен")
     
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Общий event loop мониторинга"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+            return self._loop
+    
+    def run_forever(self, start: bool = True):
+        """
+        Работа event loop мониторинга в текущем потоке (блокирующий вызов)
+        
+        Args:
+            start: Сразу запустить мониторинг
+        """
+        loop = self._get_loop()
+        self._loop_serving = True
+        asyncio.set_event_loop(loop)
+        if start:
+            self.start()
+        
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            # Даем циклу мониторинга корректно отключиться от Telegram
+            self.stop()
+            if self._monitor_task is not None and not self._monitor_task.done():
+                loop.run_until_complete(self._monitor_task)
+    
+    def _spawn_monitoring(self):
+        """Создание задачи мониторинга (вызывается внутри event loop)"""
+        self._monitor_task = self._loop.create_task(self._run_monitoring())
+    
     def start(self):
         """Запуск мониторинга"""
         if self.running:
             return
         
         self.running = True
+        loop = self._get_loop()
         
-        def run_async():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(self._run_monitoring())
+        if not self._loop_serving:
+            # Админка запущена без мониторинга - loop работает в фоновом потоке
+            self._loop_serving = True
+            threading.Thread(target=loop.run_forever, daemon=True).start()
         
-        thread = threading.Thread(target=run_async, daemon=True)
-        thread.start()
-        logger.info("Поток мониторинга запущен")
+        loop.call_soon_threadsafe(self._spawn_monitoring)
+        logger.info("Мониторинг запускается")
     
     def stop(self):
         """Остановка мониторинга"""
         self.running = False
+        if self._loop is not None and self._stop_event is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
         logger.info("Остановка мониторинга...")
     
     def is_running(self) -> bool:
@@ -395,6 +684,10 @@ monitor_service = MonitorService(config_manager)
 if __name__ == "__main__":
     import sys
     
+    # admin.app делает "from main import ..." - он должен получить этот же модуль,
+    # а не загрузить main.py второй раз со своим monitor_service
+    sys.modules.setdefault('main', sys.modules[__name__])
+    
     print("=" * 50)
     print("Мониторинг VK и Telegram")
     print("=" * 50)
@@ -424,10 +717,10 @@ if __name__ == "__main__":
             run_admin(port=port)
             sys.exit(0)
     
-    # Обычный запуск - мониторинг + админка
-    print("\nЗапуск мониторинга...")
-    monitor_service.start()
-    
+    # Обычный запуск - админка в отдельном потоке, мониторинг в основном event loop
     print("\nЗапуск админки...")
     from admin.app import run_admin
-    run_admin(port=5000)
+    threading.Thread(target=run_admin, kwargs={'port': 5000}, daemon=True).start()
+    
+    print("\nЗапуск мониторинга...")
+    monitor_service.run_forever()
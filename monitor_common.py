@@ -0,0 +1,250 @@
+"""
+Общие компоненты VK и Telegram мониторов
+"""
+import logging
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Pattern, Set
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = None
+    njit = None
+
+logger = logging.getLogger(__name__)
+
+# С какого количества ключевых слов выгоднее один проход общим матчером
+# (hyperscan / Ахо-Корасик / numba) вместо цикла по словам
+MATCHER_MIN_KEYWORDS = 8
+
+# Сколько символов текста сообщения/поста передавать в уведомление
+MATCH_TEXT_LIMIT = 300
+
+
+@dataclass(slots=True)
+class Match:
+    """Совпадение ключевых слов в сообщении Telegram или посте VK"""
+    source: str                        # 'telegram' или 'vk'
+    name: str                          # Название канала / группы / имя пользователя
+    source_url: Optional[str]          # Ссылка на канал / группу / страницу
+    item_id: int                       # ID сообщения или поста
+    text: str                          # Текст, обрезанный до MATCH_TEXT_LIMIT
+    keywords: List[str]
+    date: str                          # ДД.ММ.ГГГГ ЧЧ:ММ:СС
+    url: Optional[str]                 # Ссылка на сообщение / пост
+    entity_type: Optional[str] = None  # VK: 'group' или 'user'
+    owner_id: Optional[int] = None     # VK: owner_id стены
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _scan_bytes(text, needles, offsets, found):
+        """
+        Поиск упакованных ключевых слов в UTF-8 байтах текста
+
+        Слово k - это needles[offsets[k]:offsets[k + 1]]; для найденных слов
+        found[k] выставляется в 1. Возвращает число найденных слов.
+        """
+        n = text.shape[0]
+        matched = 0
+        for k in range(offsets.shape[0] - 1):
+            start = offsets[k]
+            length = offsets[k + 1] - start
+            if length == 0:
+                found[k] = 1
+                matched += 1
+                continue
+            first = needles[start]
+            for i in range(n - length + 1):
+                if text[i] != first:
+                    continue
+                j = 1
+                while j < length and text[i + j] == needles[start + j]:
+                    j += 1
+                if j == length:
+                    found[k] = 1
+                    matched += 1
+                    break
+        return matched
+
+
+class KeywordMatcher:
+    """
+    Поиск набора ключевых слов в тексте без учета регистра
+
+    Ключевые слова приводятся к нижнему регистру и компилируются один раз
+    при создании; найденные слова возвращаются в исходном написании и порядке.
+    Если скомпилированного матчера нет, тексты без совпадений отсеиваются
+    объединенным regex с re.IGNORECASE - без копии текста в нижнем регистре.
+    """
+
+    def __init__(self, keywords: List[str]):
+        """
+        Args:
+            keywords: Список ключевых слов
+        """
+        self.keywords = list(keywords)
+        self.keywords_lower = [keyword.lower() for keyword in self.keywords]
+        self._match: Optional[Callable[[str], Set[int]]] = None
+        self._prefilter: Optional[Pattern] = None
+        if len(self.keywords) >= MATCHER_MIN_KEYWORDS:
+            self._match = self._build(self.keywords_lower)
+        if self._match is None and self.keywords:
+            # alternation не находит пересекающиеся слова, поэтому только отсеивает
+            # тексты, а найденные слова подтверждаются циклом ниже
+            self._prefilter = re.compile('|'.join(
+                re.escape(k) for k in sorted(set(self.keywords_lower), key=len, reverse=True)
+            ), re.IGNORECASE)
+
+    def find(self, text: str) -> List[str]:
+        """
+        Проверка текста на наличие ключевых слов
+
+        Args:
+            text: Текст для проверки
+
+        Returns:
+            Список найденных ключевых слов
+        """
+        # Без текста или без ключевых слов не копируем текст в нижний регистр
+        if not text or not self.keywords:
+            return []
+
+        if self._prefilter is not None and self._prefilter.search(text) is None:
+            return []
+
+        text_lower = text.lower()
+
+        if self._match is not None:
+            return [self.keywords[i] for i in sorted(self._match(text_lower))]
+
+        # `in` для str - поиск подстроки на C (двухсторонний алгоритм / memchr),
+        # цикл на Python остается только вокруг вызовов
+        return [keyword for keyword, kw_lower in zip(self.keywords, self.keywords_lower)
+                if kw_lower in text_lower]
+
+    @staticmethod
+    def _build(keywords_lower: List[str]) -> Optional[Callable[[str], Set[int]]]:
+        """
+        Построение матчера для набора ключевых слов
+
+        Используется самый быстрый доступный вариант: база hyperscan (DFA,
+        SIMD), автомат Ахо-Корасик или скомпилированный numba поиск по байтам.
+        Все варианты находят пересекающиеся слова.
+
+        Args:
+            keywords_lower: Ключевые слова в нижнем регистре
+
+        Returns:
+            Функция text_lower -> множество индексов найденных ключевых слов
+            или None, если ни один вариант недоступен
+        """
+        if hyperscan is not None:
+            try:
+                database = hyperscan.Database()
+                database.compile(
+                    expressions=[re.escape(k).encode('utf-8') for k in keywords_lower],
+                    ids=list(range(len(keywords_lower))),
+                    elements=len(keywords_lower),
+                    flags=[hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_SINGLEMATCH] * len(keywords_lower)
+                )
+                scratch = hyperscan.Scratch(database)
+
+                def match_hyperscan(text_lower: str) -> Set[int]:
+                    found: Set[int] = set()
+
+                    def on_match(pattern_id, start, end, flags, context):
+                        found.add(pattern_id)
+
+                    database.scan(text_lower.encode('utf-8'), match_event_handler=on_match,
+                                  scratch=scratch)
+                    return found
+
+                return match_hyperscan
+            except Exception as e:
+                logger.warning("Не удалось собрать базу hyperscan: %s", e)
+
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            indexes: Dict[str, List[int]] = {}
+            for i, kw_lower in enumerate(keywords_lower):
+                indexes.setdefault(kw_lower, []).append(i)
+            for kw_lower, ids in indexes.items():
+                automaton.add_word(kw_lower, ids)
+            automaton.make_automaton()
+
+            def match_ahocorasick(text_lower: str) -> Set[int]:
+                found: Set[int] = set()
+                for _, ids in automaton.iter(text_lower):
+                    found.update(ids)
+                return found
+
+            return match_ahocorasick
+
+        if njit is not None:
+            # Слова упакованы в один массив байтов и массив смещений, чтобы внутри
+            # скомпилированной функции не было Python-объектов. Подстрока в UTF-8
+            # байтах совпадает тогда и только тогда, когда совпадает в str.
+            encoded = [k.encode('utf-8') for k in keywords_lower]
+            needles = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(k) for k in encoded], out=offsets[1:])
+
+            def match_numba(text_lower: str) -> Set[int]:
+                found = np.zeros(len(encoded), dtype=np.uint8)
+                text_bytes = np.frombuffer(text_lower.encode('utf-8'), dtype=np.uint8)
+                if not _scan_bytes(text_bytes, needles, offsets, found):
+                    return set()
+                return set(np.flatnonzero(found).tolist())
+
+            return match_numba
+
+        return None
+
+
+def matcher_for(matcher: Optional[KeywordMatcher], keywords: List[str]) -> KeywordMatcher:
+    """
+    Матчер для текущего списка ключевых слов
+
+    Существующий матчер переиспользуется, пока список не изменился.
+
+    Args:
+        matcher: Ранее построенный матчер (или None)
+        keywords: Текущий список ключевых слов
+
+    Returns:
+        Матчер для keywords
+    """
+    if matcher is None or matcher.keywords != keywords:
+        matcher = KeywordMatcher(keywords)
+    return matcher
+
+
+def truncate(text: str, limit: int = MATCH_TEXT_LIMIT) -> str:
+    """
+    Обрезка текста для уведомления
+
+    Короткий текст возвращается без копирования.
+
+    Args:
+        text: Исходный текст
+        limit: Максимум символов исходного текста
+
+    Returns:
+        Текст не длиннее limit символов (плюс '...', если он обрезан)
+    """
+    if len(text) <= limit:
+        return text
+    return text[:limit] + '...'
@@ -6,11 +6,21 @@ import asyncio
 import json
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def load_config() -> dict:
+    """Чтение config.json (orjson, если установлен)"""
+    data = (Path(__file__).parent / 'config.json').read_bytes()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
 async def test_telegram_auth():
     # Загружаем конфиг
-    config_path = Path(__file__).parent / 'config.json'
-    with open(config_path, 'r', encoding='utf-8') as f:
-        config = json.load(f)
+    config = load_config()
     
     tg_config = config.get('telegram', {})
     api_id = tg_config.get('api_id', 0)
@@ -24,6 +34,7 @@ async def test_telegram_auth():
     print(f"API Hash: {api_hash[:8]}...")
     
     from telethon import TelegramClient
+    from telethon.errors import ApiIdInvalidError
     
     # Пробуем разные имена сессий
     session_names = ['monitor_session', 'auth_session', 'test_session']
@@ -56,6 +67,11 @@ async def test_telegram_auth():
                 print(f"❌ Сессия {session_name} не авторизована")
                 await client.disconnect()
                 
+        except ApiIdInvalidError as e:
+            # Неверные api_id/api_hash - остальные сессии проверять бессмысленно
+            print(f"❌ Ошибка: {e}")
+            await client.disconnect()
+            break
         except Exception as e:
             print(f"❌ Ошибка: {e}")
     
@@ -71,9 +87,7 @@ async def test_telegram_auth():
 
 async def authorize():
     """Интерактивная авторизация"""
-    config_path = Path(__file__).parent / 'config.json'
-    with open(config_path, 'r', encoding='utf-8') as f:
-        config = json.load(f)
+    config = load_config()
     
     tg_config = config.get('telegram', {})
     api_id = tg_config.get('api_id', 0)
@@ -4,9 +4,12 @@ Telegram мониторинг каналов через Telethon
 import json
 import logging
 import asyncio
-from typing import List, Dict, Optional, Set
+import time
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 
+from monitor_common import KeywordMatcher, Match, matcher_for, truncate
+
 try:
     from telethon import TelegramClient, errors
     from telethon.tl.types import Channel, Chat
@@ -15,8 +18,31 @@ except ImportError:
     TelegramClient = None
     errors = None
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
 logger = logging.getLogger(__name__)
 
+# Сколько каналов опрашивается одновременно
+CHANNEL_CONCURRENCY = 5
+# FloodWait до стольких секунд Telethon пережидает сам, более долгие выбрасывает
+FLOOD_SLEEP_THRESHOLD = 60
+
+# Одновременных отправок ботом; каждая занимает слот не меньше SEND_SLOT_SECONDS,
+# что держит поток ниже глобального лимита Telegram (~30 сообщений/с)
+SEND_CONCURRENCY = 25
+SEND_SLOT_SECONDS = 1.0
+# В один чат - не чаще одного сообщения в CHAT_SLOT_SECONDS (лимит Telegram ~1/с на чат)
+CHAT_SLOT_SECONDS = 1.0
+# Повторы при 429: пауза берется из parameters.retry_after ответа (не больше максимума)
+SEND_MAX_RETRIES = 3
+SEND_RETRY_AFTER_MAX = 60
+
+# Экранирование HTML для parse_mode=HTML (включая &, иначе Telegram отклонит сущность)
+_HTML_ESCAPE = str.maketrans({"<": "&lt;", ">": "&gt;", "&": "&amp;"})
+
 
 class TelegramMonitor:
     """Мониторинг Telegram каналов для поиска по ключевым словам"""
@@ -40,13 +66,24 @@ class TelegramMonitor:
         self.phone = phone
         self.session_name = session_name
         self.client: Optional[TelegramClient] = None
-        self.seen_messages: Dict[str, Set[int]] = {}  # channel_id -> set of message_ids
+        # Ссылка на канал (@username) -> наибольший ID уже просмотренного сообщения
+        self.last_message_ids: Dict[str, int] = {}
         self._connected = False
+        # Матчер для текущего набора ключевых слов
+        self._matcher: Optional[KeywordMatcher] = None
+        # Ограничение одновременно опрашиваемых каналов (создается в event loop мониторинга)
+        self._channel_sem: Optional[asyncio.Semaphore] = None
+        # Ссылка на канал (@username) -> сущность Telethon, переиспользуется между циклами
+        self._entity_cache: Dict[str, object] = {}
+        # Ссылка на канал (@username) -> время (time.monotonic), до которого канал
+        # пропускается после FloodWait
+        self._flood_until: Dict[str, float] = {}
     
     async def connect(self):
         """Асинхронное подключение к Telegram"""
         try:
-            self.client = TelegramClient(self.session_name, self.api_id, self.api_hash)
+            self.client = TelegramClient(self.session_name, self.api_id, self.api_hash,
+                                         flood_sleep_threshold=FLOOD_SLEEP_THRESHOLD)
             await self.client.connect()
             
             if not await self.client.is_user_authorized():
@@ -73,6 +110,62 @@ class TelegramMonitor:
             self._connected = False
             logger.info("Отключено от Telegram")
     
+    @staticmethod
+    def _normalize_link(channel_link: str) -> str:
+        """Очистка ссылки на канал до вида @username"""
+        channel_link = channel_link.replace('https://t.me/', '@').replace('http://t.me/', '@')
+        if not channel_link.startswith('@'):
+            channel_link = '@' + channel_link
+        return channel_link
+    
+    async def _get_entity(self, channel_link: str):
+        """
+        Получение сущности канала с кэшированием между циклами
+        
+        Args:
+            channel_link: Ссылка на канал вида @username (см. _normalize_link)
+            
+        Returns:
+            Сущность Telethon
+        """
+        entity = self._entity_cache.get(channel_link)
+        if entity is None:
+            entity = await self.client.get_entity(channel_link)
+            self._entity_cache[channel_link] = entity
+        return entity
+    
+    def _forget_entity(self, channel_link: str):
+        """Удаление канала из кэша сущностей (при ошибке доступа к нему)"""
+        self._entity_cache.pop(channel_link, None)
+    
+    @staticmethod
+    def _entity_to_info(entity) -> Optional[Dict]:
+        """Информация о канале из сущности Telethon"""
+        if isinstance(entity, Channel):
+            return {
+                'id': entity.id,
+                'title': entity.title,
+                'username': entity.username,
+                'link': f"https://t.me/{entity.username}" if entity.username else None
+            }
+        elif isinstance(entity, Chat):
+            return {
+                'id': entity.id,
+                'title': entity.title,
+                'username': None,
+                'link': None
+            }
+        return None
+    
+    @staticmethod
+    def _messages_to_dicts(messages) -> List[Dict]:
+        """Текстовые сообщения из ответа get_messages"""
+        return [{
+            'id': msg.id,
+            'text': msg.text,
+            'date': msg.date.isoformat() if msg.date else None
+        } for msg in messages if msg.text]
+    
     async def get_channel_info(self, channel_link: str) -> Optional[Dict]:
         """
         Получение информации о канале
@@ -84,29 +177,10 @@ class TelegramMonitor:
             Информация о канале или None
         """
         try:
-            # Очищаем ссылку
-            channel_link = channel_link.replace('https://t.me/', '@').replace('http://t.me/', '@')
-            if not channel_link.startswith('@'):
-                channel_link = '@' + channel_link
-            
-            entity = await self.client.get_entity(channel_link)
-            
-            if isinstance(entity, Channel):
-                return {
-                    'id': entity.id,
-                    'title': entity.title,
-                    'username': entity.username,
-                    'link': f"https://t.me/{entity.username}" if entity.username else None
-                }
-            elif isinstance(entity, Chat):
-                return {
-                    'id': entity.id,
-                    'title': entity.title,
-                    'username': None,
-                    'link': None
-                }
-            return None
+            return self._entity_to_info(await self._get_entity(self._normalize_link(channel_link)))
             
+        except errors.FloodWaitError:
+            raise
         except Exception as e:
             logger.error(f"Ошибка получения информации о канале {channel_link}: {e}")
             return None
@@ -122,17 +196,8 @@ class TelegramMonitor:
         Returns:
             Список найденных ключевых слов
         """
-        if not text:
-            return []
-        
-        text_lower = text.lower()
-        found = []
-        
-        for keyword in keywords:
-            if keyword.lower() in text_lower:
-                found.append(keyword)
-        
-        return found
+        self._matcher = matcher_for(self._matcher, keywords)
+        return self._matcher.find(text)
     
     async def get_recent_messages(self, channel_link: str, limit: int = 20) -> List[Dict]:
         """
@@ -146,31 +211,46 @@ class TelegramMonitor:
             Список сообщений
         """
         try:
-            # Очищаем ссылку
-            channel_link = channel_link.replace('https://t.me/', '@').replace('http://t.me/', '@')
-            if not channel_link.startswith('@'):
-                channel_link = '@' + channel_link
-            
-            entity = await self.client.get_entity(channel_link)
-            messages = await self.client.get_messages(entity, limit=limit)
-            
-            result = []
-            for msg in messages:
-                if msg.text:
-                    result.append({
-                        'id': msg.id,
-                        'text': msg.text,
-                        'date': msg.date.isoformat() if msg.date else None
-                    })
-            
-            return result
+            _, messages = await self._fetch_channel(self._normalize_link(channel_link), limit)
+            return self._messages_to_dicts(messages)
             
+        except errors.FloodWaitError:
+            raise
         except Exception as e:
             logger.error(f"Ошибка получения сообщений из канала {channel_link}: {e}")
             return []
     
+    async def _fetch_channel(self, channel_link: str, limit: int,
+                             min_id: int = 0) -> Tuple[Optional[Dict], List]:
+        """
+        Информация о канале и его последние сообщения с одним разрешением сущности
+        
+        Args:
+            channel_link: Ссылка на канал вида @username
+            limit: Количество сообщений
+            min_id: Вернуть только сообщения с ID больше этого
+            
+        Returns:
+            (информация о канале или None, сообщения Telethon)
+        """
+        entity = await self._get_entity(channel_link)
+        channel_info = self._entity_to_info(entity)
+        if channel_info is None:
+            return None, []
+        
+        try:
+            messages = await self.client.get_messages(entity, limit=limit, min_id=min_id)
+        except errors.FloodWaitError:
+            raise
+        except Exception:
+            # Сущность могла устареть (канал удален, доступ закрыт) - определим заново
+            self._forget_entity(channel_link)
+            raise
+        
+        return channel_info, messages
+    
     async def monitor_channels(self, channels: List[str], keywords: List[str],
-                                limit: int = 20) -> List[Dict]:
+                                limit: int = 20) -> List[Match]:
         """
         Мониторинг каналов на наличие ключевых слов
         
@@ -186,62 +266,79 @@ class TelegramMonitor:
             logger.error("Не подключено к Telegram")
             return []
         
-        all_matches = []
+        # Ключевые слова приводятся к нижнему регистру один раз, а не на каждое сообщение
+        matcher = self._matcher = matcher_for(self._matcher, keywords)
+        
+        if self._channel_sem is None:
+            self._channel_sem = asyncio.Semaphore(CHANNEL_CONCURRENCY)
+        
+        results = await asyncio.gather(
+            *(self._process_channel(channel_link, matcher, limit) for channel_link in channels)
+        )
+        return [match for channel_matches in results for match in channel_matches]
+    
+    async def _process_channel(self, channel_link: str, matcher: KeywordMatcher,
+                               limit: int) -> List[Match]:
+        """
+        Поиск ключевых слов в новых сообщениях одного канала
         
-        for channel_link in channels:
+        Args:
+            channel_link: Ссылка на канал
+            matcher: Матчер ключевых слов
+            limit: Количество сообщений для проверки
+            
+        Returns:
+            Список найденных совпадений
+        """
+        matches = []
+        # Ссылка очищается один раз; исходная остается для логов и ссылки на чат
+        normalized_link = self._normalize_link(channel_link)
+        
+        if time.monotonic() < self._flood_until.get(normalized_link, 0.0):
+            logger.debug(f"Канал {channel_link} пропущен: действует FloodWait")
+            return matches
+        
+        async with self._channel_sem:
             try:
-                # Получаем информацию о канале
-                channel_info = await self.get_channel_info(channel_link)
+                # Сущность канала определяется один раз для информации и сообщений;
+                # сервер возвращает только сообщения новее уже просмотренных
+                last_id = self.last_message_ids.get(normalized_link, 0)
+                channel_info, messages = await self._fetch_channel(normalized_link, limit, last_id)
                 if not channel_info:
                     logger.warning(f"Канал {channel_link} не найден")
-                    continue
+                    return matches
                 
-                channel_id = str(channel_info['id'])
                 channel_name = channel_info['title']
                 channel_url = channel_info['link'] or channel_link
                 
-                # Инициализируем seen_messages для канала
-                if channel_id not in self.seen_messages:
-                    self.seen_messages[channel_id] = set()
-                
-                # Получаем сообщения
-                messages = await self.get_recent_messages(channel_link, limit)
+                if messages:
+                    self.last_message_ids[normalized_link] = max(last_id, max(msg.id for msg in messages))
                 
-                # Ищем совпадения только в новых сообщениях
-                for msg in messages:
+                for msg in self._messages_to_dicts(messages):
                     msg_id = msg['id']
-                    if msg_id in self.seen_messages[channel_id]:
-                        continue
-                    
-                    self.seen_messages[channel_id].add(msg_id)
-                    
                     text = msg['text']
-                    found_keywords = self.check_keywords(text, keywords)
+                    found_keywords = matcher.find(text)
                     
                     if found_keywords:
-                        all_matches.append({
-                            'source': 'telegram',
-                            'channel_name': channel_name,
-                            'channel_url': channel_url,
-                            'message_id': msg_id,
-                            'text': text[:300] + ('...' if len(text) > 500 else ''),
-                            'keywords': found_keywords,
-                            'date': (datetime.fromisoformat(msg['date'][:-6]) + timedelta(hours=3)).strftime("%d.%m.%Y %H:%M:%S"),
-                            'url': f"{channel_url}/{msg_id}" if channel_url else None
-                        })
-                
-                # Ограничиваем размер seen_messages
-                if len(self.seen_messages[channel_id]) > 1000:
-                    self.seen_messages[channel_id] = set(list(self.seen_messages[channel_id])[-500:])
-                
-                # Небольшая пауза между запросами
-                await asyncio.sleep(1)
+                        matches.append(Match(
+                            source='telegram',
+                            name=channel_name,
+                            source_url=channel_url,
+                            item_id=msg_id,
+                            text=truncate(text),
+                            keywords=found_keywords,
+                            date=(datetime.fromisoformat(msg['date'][:-6]) + timedelta(hours=3)).strftime("%d.%m.%Y %H:%M:%S"),
+                            url=f"{channel_url}/{msg_id}" if channel_url else None
+                        ))
                 
+            except errors.FloodWaitError as e:
+                # Цикл не ждет: канал пропускается, пока не истечет FloodWait
+                self._flood_until[normalized_link] = time.monotonic() + e.seconds
+                logger.warning(f"FloodWait для канала {channel_link}: пропуск на {e.seconds} с")
             except Exception as e:
                 logger.error(f"Ошибка при мониторинге канала {channel_link}: {e}")
-                continue
         
-        return all_matches
+        return matches
 
 
 class TelegramNotifier:
@@ -256,6 +353,25 @@ class TelegramNotifier:
         """
         self.bot_token = bot_token
         self.api_url = f"https://api.telegram.org/bot{bot_token}"
+        self._send_sem: Optional[asyncio.Semaphore] = None
+        # chat_id -> блокировка: сообщения в один чат уходят по очереди (FIFO)
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        # HTTP-сессия бота: соединения с api.telegram.org переиспользуются между отправками
+        self._http: Optional["aiohttp.ClientSession"] = None
+    
+    def _get_http(self) -> "aiohttp.ClientSession":
+        """Получение (или создание) HTTP-сессии для отправки сообщений"""
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=SEND_CONCURRENCY)
+            )
+        return self._http
+    
+    async def close(self):
+        """Закрытие HTTP-сессии нотификатора"""
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        self._http = None
     
     async def send_message(self, chat_id: int, text: str, 
                            parse_mode: str = "HTML") -> bool:
@@ -270,8 +386,6 @@ class TelegramNotifier:
         Returns:
             True если успешно
         """
-        import aiohttp
-        
         url = f"{self.api_url}/sendMessage"
         data = {
             'chat_id': chat_id,
@@ -281,19 +395,32 @@ class TelegramNotifier:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=data) as response:
+            for attempt in range(SEND_MAX_RETRIES + 1):
+                async with self._get_http().post(url, json=data) as response:
                     if response.status == 200:
                         return True
-                    else:
+                    if response.status != 429 or attempt == SEND_MAX_RETRIES:
                         error = await response.text()
                         logger.error(f"Ошибка отправки сообщения: {error}")
                         return False
+                    retry_after = await self._retry_after(response)
+                logger.warning(f"Лимит отправки в чат {chat_id}, повтор через {retry_after} с")
+                await asyncio.sleep(retry_after)
         except Exception as e:
             logger.error(f"Ошибка отправки сообщения: {e}")
             return False
     
-    def format_match_message(self, match: Dict, ai_result=None) -> str:
+    @staticmethod
+    async def _retry_after(response: "aiohttp.ClientResponse") -> float:
+        """Пауза перед повтором из ответа 429 (parameters.retry_after)"""
+        try:
+            body = await response.json(content_type=None)
+            retry_after = float(body.get('parameters', {}).get('retry_after', 1))
+        except Exception:
+            retry_after = 1.0
+        return min(max(retry_after, 0.0), SEND_RETRY_AFTER_MAX)
+    
+    def format_match_message(self, match: Match, ai_result=None) -> str:
         """
         Форматирование сообщения о совпадении
         
@@ -304,62 +431,54 @@ class TelegramNotifier:
         Returns:
             Отформатированное сообщение
         """
-        source = match.get('source', 'unknown')
-        keywords = ', '.join(match.get('keywords', []))
+        source = match.source
+        keywords = ', '.join(match.keywords)
+        # Текст уже обрезан мониторами (truncate)
+        text = match.text
         
         # Формируем AI-часть сообщения
         ai_text = ""
         if ai_result and ai_result.success:
             analysis = ai_result.analysis or ""
-            # Экранируем HTML
-            analysis = analysis.replace('<', '&lt;').replace('>', '&gt;')
+            # Экранируем HTML за один проход
+            analysis = analysis.translate(_HTML_ESCAPE)
             ai_text = f"\n\n🤖 <b>AI Анализ:</b>\n{analysis}"
         elif ai_result and ai_result.error:
             ai_text = f"\n\n🤖 <b>AI Анализ:</b>\n<i>⚠️ {ai_result.error}</i>"
         
         if source == 'telegram':
-            channel = match.get('channel_name', 'Неизвестный канал')
-            url = match.get('url', '')
-            text = match.get('text', '')
-            date = match.get('date', '')
-            
             message = f"""🔔 <b>Найдено совпадение в Telegram!</b>
 
-📢 <b>Канал:</b> {channel}
+📢 <b>Канал:</b> {match.name or 'Неизвестный канал'}
 🔑 <b>Ключевые слова:</b> {keywords}
-📅 <b>Дата:</b> {date}
+📅 <b>Дата:</b> {match.date}
 
 📝 <b>Текст:</b>
-<code>{text[:300]}{'...' if len(text) > 300 else ''}</code>{ai_text}
+<code>{text}</code>{ai_text}
 
-🔗 <a href="{url}">Ссылка на сообщение</a>"""
+🔗 <a href="{match.url or ''}">Ссылка на сообщение</a>"""
         
         elif source == 'vk':
-            group = match.get('group_name', 'Неизвестная группа')
-            url = match.get('url', '')
-            text = match.get('text', '')
-            date = match.get('date', '')
-            
             message = f"""🔔 <b>Найдено совпадение в VK!</b>
 
-👥 <b>Группа:</b> {group}
+👥 <b>Группа:</b> {match.name or 'Неизвестная группа'}
 🔑 <b>Ключевые слова:</b> {keywords}
-📅 <b>Дата:</b> {date}
+📅 <b>Дата:</b> {match.date}
 
 📝 <b>Текст:</b>
-<code>{text[:300]}{'...' if len(text) > 300 else ''}</code>{ai_text}
+<code>{text}</code>{ai_text}
 
-🔗 <a href="{url}">Ссылка на пост</a>"""
+🔗 <a href="{match.url or ''}">Ссылка на пост</a>"""
         
         else:
             message = f"""🔔 <b>Найдено совпадение!</b>
 
 🔑 <b>Ключевые слова:</b> {keywords}
-📝 <b>Текст:</b> {match.get('text', '')[:300]}{ai_text}"""
+📝 <b>Текст:</b> {text}{ai_text}"""
         
         return message
     
-    async def notify_recipients(self, recipients: List[int], match: Dict, ai_result=None):
+    async def notify_recipients(self, recipients: List[int], match: Match, ai_result=None):
         """
         Отправка уведомления всем получателям
         
@@ -370,9 +489,29 @@ class TelegramNotifier:
         """
         message = self.format_match_message(match, ai_result)
         
-        for chat_id in recipients:
-            await self.send_message(chat_id, message)
-            await asyncio.sleep(0.1)  # Небольшая пауза между отправками
+        if self._send_sem is None:
+            self._send_sem = asyncio.Semaphore(SEND_CONCURRENCY)
+        
+        await asyncio.gather(*(self._send_limited(chat_id, message) for chat_id in recipients))
+    
+    async def _send_limited(self, chat_id: int, text: str) -> bool:
+        """Отправка сообщения с ограничением общего темпа и темпа в один чат"""
+        loop = asyncio.get_running_loop()
+        chat_lock = self._chat_locks.get(chat_id)
+        if chat_lock is None:
+            chat_lock = self._chat_locks[chat_id] = asyncio.Lock()
+        
+        async with chat_lock:
+            async with self._send_sem:
+                started = loop.time()
+                try:
+                    sent = await self.send_message(chat_id, text)
+                finally:
+                    # Слот освобождается не раньше чем через SEND_SLOT_SECONDS
+                    await asyncio.sleep(max(0.0, started + SEND_SLOT_SECONDS - loop.time()))
+            # Следующее сообщение в этот чат - не раньше чем через CHAT_SLOT_SECONDS
+            await asyncio.sleep(max(0.0, started + CHAT_SLOT_SECONDS - loop.time()))
+        return sent
 
 
 async def authorize_telegram(api_id: int, api_hash: str, phone: str):
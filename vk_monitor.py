@@ -1,11 +1,15 @@
 """
 VK API мониторинг групп и страниц пользователей
 """
+import asyncio
 import json
 import logging
 import time
-from typing import List, Dict, Optional, Set, Tuple
-from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+
+import aiohttp
+
+from monitor_common import KeywordMatcher, Match, matcher_for, truncate
 
 try:
     import vk_api
@@ -14,8 +18,58 @@ except ImportError:
     vk_api = None
     ApiError = Exception
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
+try:
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+except ImportError:
+    HTTPAdapter = None
+    Retry = None
+
 logger = logging.getLogger(__name__)
 
+# Максимум вызовов API в одном запросе execute (ограничение VK)
+EXECUTE_BATCH_SIZE = 25
+
+# Пул keep-alive соединений requests.Session внутри vk_api
+HTTP_POOL_MAXSIZE = 20
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.2
+
+# Прямые асинхронные вызовы VK API (aiohttp) в цикле мониторинга
+VK_API_URL = "https://api.vk.com/method"
+VK_API_VERSION = "5.131"
+HTTP_TIMEOUT = 30
+# Минимальный интервал между прямыми вызовами API (лимит VK ~3 запроса/с, как в vk_api)
+VK_RPS_DELAY = 0.34
+# Коды ошибок wall.get, означающие, что стена недоступна или источника нет:
+# 15 - доступ запрещен, 18 - страница удалена/заблокирована, 30 - приватный
+# профиль, 100 - неверный owner_id, 113 - неверный ID пользователя.
+# Ошибки лимитов и авторизации кэш источников не сбрасывают.
+VK_FORGET_ERROR_CODES = frozenset({15, 18, 30, 100, 113})
+
+
+class VKRequestError(Exception):
+    """Ошибка, возвращенная VK API на асинхронный вызов"""
+
+    def __init__(self, method: str, error: Dict):
+        self.code = error.get('error_code', 0)
+        self.msg = error.get('error_msg', '')
+        super().__init__(f"[{self.code}] {self.msg} ({method})")
+
+
+def _format_post_date(timestamp: int) -> str:
+    """Дата поста в виде ДД.ММ.ГГГГ ЧЧ:ММ:СС (местное время) без datetime и strftime"""
+    lt = time.localtime(timestamp)
+    return (f"{lt.tm_mday:02d}.{lt.tm_mon:02d}.{lt.tm_year} "
+            f"{lt.tm_hour:02d}:{lt.tm_min:02d}:{lt.tm_sec:02d}")
+
 
 class VKMonitor:
     """Мониторинг VK групп и страниц пользователей для поиска по ключевым словам"""
@@ -33,19 +87,57 @@ class VKMonitor:
         self.access_token = access_token
         self.vk_session = None
         self.vk = None
-        self.seen_posts: Dict[str, Set[int]] = {}  # entity_id -> set of post_ids
+        # owner_id (со знаком: группа -N и пользователь N - разные стены) ->
+        # наибольший ID уже просмотренного поста (ID на стене только растут)
+        self.last_post_ids: Dict[int, int] = {}
+        # Матчер для текущего набора ключевых слов
+        self._matcher: Optional[KeywordMatcher] = None
+        # Очищенный ID источника -> информация о сущности (тип и ID источника не меняются)
+        self._entity_cache: Dict[str, Dict] = {}
+        # HTTP-сессия для асинхронных вызовов API (создается при первом запросе)
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._api_params: Dict[str, str] = {}
+        # Интервал между асинхронными вызовами (блокировка создается в event loop)
+        self._rate_lock: Optional[asyncio.Lock] = None
+        self._last_call = 0.0
         self._connect()
 
     def _connect(self):
         """Подключение к VK API"""
         try:
             self.vk_session = vk_api.VkApi(token=self.access_token)
+            self._configure_http(self.vk_session.http)
             self.vk = self.vk_session.get_api()
+            # Постоянные параметры прямых вызовов API (токен и версия как у vk_api)
+            self._api_params = {
+                'access_token': self.access_token,
+                'v': getattr(self.vk_session, 'api_version', None) or VK_API_VERSION
+            }
             logger.info("Успешное подключение к VK API")
         except Exception as e:
-            logger.error(f"Ошибка подключения к VK API: {e}")
+            logger.error("Ошибка подключения к VK API: %s", e)
             raise
 
+    @staticmethod
+    def _configure_http(http):
+        """
+        Настройка пула соединений сессии requests, через которую ходит vk_api
+
+        Все запросы идут на api.vk.com, поэтому достаточно одного пула; TLS-
+        соединения переиспользуются, сетевые сбои повторяются с паузой.
+
+        Args:
+            http: requests.Session объекта VkApi
+        """
+        if HTTPAdapter is None:
+            return
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            max_retries=Retry(total=HTTP_MAX_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR)
+        )
+        http.mount('https://', adapter)
+
     def get_entity_info(self, entity_id: str) -> Optional[Dict]:
         """
         Получение информации о сущности (группа или пользователь)
@@ -66,23 +158,152 @@ class VKMonitor:
                 'url': str              # Ссылка на сущность
             }
         """
-        # Очищаем входные данные
-        entity_id = entity_id.strip().replace('https://vk.com/', '').replace('http://vk.com/', '')
-        entity_id = entity_id.strip('/')
+        return self._lookup_entity(self._normalize_source(entity_id))
 
-        # Сначала пробуем как группу
-        group_info = self._try_get_group_info(entity_id)
-        if group_info:
-            return group_info
+    def _lookup_entity(self, entity_id: str) -> Optional[Dict]:
+        """
+        Определение уже очищенного источника (см. _normalize_source)
 
-        # Если не группа, пробуем как пользователя
-        user_info = self._try_get_user_info(entity_id)
-        if user_info:
-            return user_info
+        Args:
+            entity_id: ID или короткое имя группы/пользователя
 
-        logger.warning(f"Сущность {entity_id} не найдена (ни группа, ни пользователь)")
+        Returns:
+            Словарь с информацией о сущности или None
+        """
+        info = self._entity_cache.get(entity_id)
+        if info is not None:
+            return info
+
+        # Сначала пробуем как группу, затем как пользователя
+        info = self._try_get_group_info(entity_id) or self._try_get_user_info(entity_id)
+        if info:
+            self._entity_cache[entity_id] = info
+            return info
+
+        logger.warning("Сущность %s не найдена (ни группа, ни пользователь)", entity_id)
         return None
 
+    @staticmethod
+    def _normalize_source(entity_id: str) -> str:
+        """Очистка ссылки на источник до ID или короткого имени"""
+        entity_id = entity_id.strip().replace('https://vk.com/', '').replace('http://vk.com/', '')
+        return entity_id.strip('/')
+
+    @staticmethod
+    def _group_key(entity_id: str) -> str:
+        """Ключ для сопоставления источника с результатом groups.getById"""
+        key = entity_id.lower()
+        if key.lstrip('-').isdigit():
+            return key.lstrip('-')
+        for prefix in ('club', 'public', 'event'):
+            if key.startswith(prefix) and key[len(prefix):].isdigit():
+                return key[len(prefix):]
+        return key
+
+    @staticmethod
+    def _user_key(entity_id: str) -> str:
+        """Ключ для сопоставления источника с результатом users.get"""
+        key = entity_id.lower()
+        if key.startswith('id') and key[2:].isdigit():
+            return key[2:]
+        return key
+
+    @staticmethod
+    def _group_to_info(group: Dict) -> Dict:
+        """Унифицированная информация о группе из ответа groups.getById"""
+        group_id_val = group.get('id', 0)
+        screen_name = group.get('screen_name', f'club{group_id_val}')
+
+        return {
+            'id': group_id_val,
+            'owner_id': -group_id_val,  # Отрицательный ID для групп
+            'type': 'group',
+            'name': group.get('name', 'Неизвестная группа'),
+            'screen_name': screen_name,
+            'url': f"https://vk.com/{screen_name}"
+        }
+
+    @staticmethod
+    def _user_to_info(user: Dict) -> Dict:
+        """Унифицированная информация о пользователе из ответа users.get"""
+        user_id_val = user.get('id', 0)
+
+        # Формируем полное имя
+        first_name = user.get('first_name', '')
+        last_name = user.get('last_name', '')
+        full_name = f"{first_name} {last_name}".strip() or f"id{user_id_val}"
+
+        # Получаем домен если есть
+        domain = user.get('domain', f'id{user_id_val}')
+
+        return {
+            'id': user_id_val,
+            'owner_id': user_id_val,  # Положительный ID для пользователей
+            'type': 'user',
+            'name': full_name,
+            'screen_name': domain,
+            'url': f"https://vk.com/{domain}"
+        }
+
+    @classmethod
+    def _index_users(cls, users: List[Dict]) -> Dict[str, Dict]:
+        """Информация о пользователях из ответа users.get по ID и короткому имени"""
+        users_by_key: Dict[str, Dict] = {}
+        for user in users:
+            info = cls._user_to_info(user)
+            users_by_key[str(info['id'])] = info
+            users_by_key[info['screen_name'].lower()] = info
+        return users_by_key
+
+    def _split_cached(self, sources: List[str]) -> Tuple[Dict[str, Optional[Dict]], Dict[str, str]]:
+        """
+        Разделение источников на уже определенные (из кэша) и требующие запроса
+
+        Args:
+            sources: Список ID или коротких имен групп/пользователей
+
+        Returns:
+            (источник -> информация из кэша, источник -> очищенный ID для запроса)
+        """
+        cached: Dict[str, Optional[Dict]] = {}
+        pending: Dict[str, str] = {}
+        for source in sources:
+            entity_id = self._normalize_source(source)
+            info = self._entity_cache.get(entity_id)
+            if info is None:
+                pending[source] = entity_id
+            else:
+                cached[source] = info
+        return cached, pending
+
+    def _remember_entities(self, pending: Dict[str, str], entities: Dict[str, Optional[Dict]]):
+        """Сохранение найденных сущностей в кэш (ненайденные будут запрошены снова)"""
+        for source, entity_id in pending.items():
+            info = entities.get(source)
+            if info is not None:
+                self._entity_cache[entity_id] = info
+
+    @staticmethod
+    def _execute_error_codes(result: Dict) -> List[int]:
+        """Коды ошибок вызовов внутри execute, в порядке неудавшихся вызовов"""
+        return [error.get('error_code', 0) for error in result.get('execute_errors') or []]
+
+    def _forget_owner(self, owner_id: int, code: int):
+        """
+        Удаление из кэша сущностей со стеной owner_id
+
+        Кэш сбрасывается, только если код ошибки означает, что стена
+        недоступна или не найдена (VK_FORGET_ERROR_CODES).
+
+        Args:
+            owner_id: ID владельца стены
+            code: Код ошибки VK API
+        """
+        if code not in VK_FORGET_ERROR_CODES:
+            return
+        for entity_id in [e for e, info in self._entity_cache.items() if info['owner_id'] == owner_id]:
+            del self._entity_cache[entity_id]
+
     def _try_get_group_info(self, group_id: str) -> Optional[Dict]:
         """
         Попытка получить информацию о группе
@@ -104,25 +325,14 @@ class VKMonitor:
                 groups = self.vk.groups.getById(group_id=group_id)
 
             if groups:
-                group = groups[0]
-                group_id_val = group.get('id', 0)
-                screen_name = group.get('screen_name', f'club{group_id_val}')
-
-                return {
-                    'id': group_id_val,
-                    'owner_id': -group_id_val,  # Отрицательный ID для групп
-                    'type': 'group',
-                    'name': group.get('name', 'Неизвестная группа'),
-                    'screen_name': screen_name,
-                    'url': f"https://vk.com/{screen_name}"
-                }
+                return self._group_to_info(groups[0])
             return None
         except ApiError as e:
             # Группа не найдена - это нормально, возможно это пользователь
-            logger.debug(f"Это не группа {group_id}: {e}")
+            logger.debug("Это не группа %s: %s", group_id, e)
             return None
         except Exception as e:
-            logger.debug(f"Ошибка при проверке группы {group_id}: {e}")
+            logger.debug("Ошибка при проверке группы %s: %s", group_id, e)
             return None
 
     def _try_get_user_info(self, user_id: str) -> Optional[Dict]:
@@ -144,31 +354,13 @@ class VKMonitor:
                 users = self.vk.users.get(user_ids=user_id)
 
             if users:
-                user = users[0]
-                user_id_val = user.get('id', 0)
-
-                # Формируем полное имя
-                first_name = user.get('first_name', '')
-                last_name = user.get('last_name', '')
-                full_name = f"{first_name} {last_name}".strip() or f"id{user_id_val}"
-
-                # Получаем домен если есть
-                domain = user.get('domain', f'id{user_id_val}')
-
-                return {
-                    'id': user_id_val,
-                    'owner_id': user_id_val,  # Положительный ID для пользователей
-                    'type': 'user',
-                    'name': full_name,
-                    'screen_name': domain,
-                    'url': f"https://vk.com/{domain}"
-                }
+                return self._user_to_info(users[0])
             return None
         except ApiError as e:
-            logger.debug(f"Это не пользователь {user_id}: {e}")
+            logger.debug("Это не пользователь %s: %s", user_id, e)
             return None
         except Exception as e:
-            logger.debug(f"Ошибка при проверке пользователя {user_id}: {e}")
+            logger.debug("Ошибка при проверке пользователя %s: %s", user_id, e)
             return None
 
     def get_wall_posts(self, owner_id: int, count: int = 20) -> List[Dict]:
@@ -186,13 +378,239 @@ class VKMonitor:
             posts = self.vk.wall.get(owner_id=owner_id, count=count)
             return posts.get('items', [])
         except ApiError as e:
+            # Стена недоступна - источник определим заново в следующем цикле
+            self._forget_owner(owner_id, e.code)
             error_msg = str(e)
             if 'access denied' in error_msg.lower() or 'private' in error_msg.lower():
-                logger.warning(f"Нет доступа к стене {owner_id} (возможно, приватный профиль)")
+                logger.warning("Нет доступа к стене %s (возможно, приватный профиль)", owner_id)
             else:
-                logger.error(f"Ошибка получения постов стены {owner_id}: {e}")
+                logger.error("Ошибка получения постов стены %s: %s", owner_id, e)
             return []
 
+    def _get_http(self) -> aiohttp.ClientSession:
+        """Получение (или создание) HTTP-сессии для асинхронных вызовов"""
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=HTTP_POOL_MAXSIZE),
+                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+            )
+        return self._http
+
+    async def close(self):
+        """Закрытие HTTP-сессии асинхронных вызовов"""
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        self._http = None
+        # Блокировка привязана к event loop, в котором создана
+        self._rate_lock = None
+
+    async def _wait_rate_limit(self):
+        """Ожидание очереди на вызов API: не чаще одного раза в VK_RPS_DELAY"""
+        if self._rate_lock is None:
+            self._rate_lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        async with self._rate_lock:
+            delay = self._last_call + VK_RPS_DELAY - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last_call = loop.time()
+
+    async def _call(self, method: str, **params):
+        """
+        Асинхронный вызов метода VK API
+
+        Args:
+            method: Имя метода (например, 'wall.get')
+            **params: Параметры метода
+
+        Returns:
+            Поле response ответа
+
+        Raises:
+            VKRequestError: VK вернул ошибку
+        """
+        return (await self._call_raw(method, **params)).get('response')
+
+    async def _call_raw(self, method: str, **params) -> Dict:
+        """
+        Асинхронный вызов метода VK API с полным ответом (включая execute_errors)
+
+        Raises:
+            VKRequestError: VK вернул ошибку
+        """
+        data = {key: str(value) for key, value in params.items()}
+        data.update(self._api_params)
+
+        await self._wait_rate_limit()
+
+        async with self._get_http().post(f"{VK_API_URL}/{method}", data=data) as response:
+            body = await response.read()
+
+        # Сырые байты ответа разбираются orjson (если установлен), без промежуточного str
+        result = _json_loads(body)
+        if 'error' in result:
+            raise VKRequestError(method, result['error'])
+        return result
+
+    async def _resolve_entities_async(self, sources: List[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Определение всех источников с минимумом запросов
+
+        Определенные ранее источники берутся из кэша; остальные группы
+        запрашиваются одним вызовом groups.getById, пользователи - одним users.get.
+
+        Args:
+            sources: Список ID или коротких имен групп/пользователей
+
+        Returns:
+            Словарь источник -> информация о сущности (или None)
+        """
+        entities, pending = self._split_cached(sources)
+        if pending:
+            fetched = await self._fetch_entities_async(pending)
+            self._remember_entities(pending, fetched)
+            entities.update(fetched)
+        return entities
+
+    async def _try_get_group_info_async(self, group_id: str) -> Optional[Dict]:
+        """Асинхронный аналог _try_get_group_info"""
+        try:
+            groups = await self._call('groups.getById', group_id=self._group_key(group_id))
+            if groups:
+                return self._group_to_info(groups[0])
+            return None
+        except Exception as e:
+            logger.debug("Это не группа %s: %s", group_id, e)
+            return None
+
+    async def _try_get_user_info_async(self, user_id: str) -> Optional[Dict]:
+        """Асинхронный аналог _try_get_user_info"""
+        try:
+            users = await self._call('users.get', user_ids=user_id, fields='domain')
+            if users:
+                return self._user_to_info(users[0])
+            return None
+        except Exception as e:
+            logger.debug("Это не пользователь %s: %s", user_id, e)
+            return None
+
+    async def _fetch_entities_async(self, normalized: Dict[str, str]) -> Dict[str, Optional[Dict]]:
+        """
+        Запрос информации об источниках пакетными вызовами API
+
+        Группы определяются одним groups.getById, оставшиеся источники - одним
+        users.get. Если пакетный groups.getById отклонен (достаточно одного
+        неверного ID), группы запрашиваются по одной, а пользователи все равно
+        одним users.get.
+
+        Args:
+            normalized: Источник -> очищенный ID или короткое имя
+
+        Returns:
+            Словарь источник -> информация о сущности (или None)
+        """
+        groups_by_key: Dict[str, Dict] = {}
+        group_keys = list(dict.fromkeys(self._group_key(e) for e in normalized.values()))
+
+        try:
+            groups = [self._group_to_info(group) for group in
+                      await self._call('groups.getById', group_ids=",".join(group_keys)) or []]
+        except Exception as e:
+            logger.debug("Пакетный запрос groups.getById не удался: %s", e)
+            groups = []
+            for key in group_keys:
+                info = await self._try_get_group_info_async(key)
+                if info:
+                    groups.append(info)
+
+        for info in groups:
+            groups_by_key[str(info['id'])] = info
+            groups_by_key[info['screen_name'].lower()] = info
+
+        entities = {source: groups_by_key.get(self._group_key(entity_id))
+                    for source, entity_id in normalized.items()}
+
+        missing = list(dict.fromkeys(
+            normalized[source] for source, info in entities.items() if info is None
+        ))
+        if missing:
+            try:
+                users_by_key = self._index_users(
+                    await self._call('users.get', user_ids=",".join(missing), fields='domain') or []
+                )
+            except Exception as e:
+                logger.debug("Пакетный запрос users.get не удался: %s", e)
+                users_by_key = None
+
+            for source, info in entities.items():
+                if info is None:
+                    if users_by_key is None:
+                        entities[source] = await self._try_get_user_info_async(normalized[source])
+                    else:
+                        entities[source] = users_by_key.get(self._user_key(normalized[source]))
+
+        return entities
+
+    async def get_walls_batch_async(self, owner_ids: List[int], count: int = 20) -> Dict[int, List[Dict]]:
+        """
+        Получение постов с нескольких стен через execute
+
+        До EXECUTE_BATCH_SIZE вызовов wall.get выполняются на стороне VK
+        за один HTTP-запрос; пакеты отправляются по очереди.
+
+        Args:
+            owner_ids: ID владельцев стен
+            count: Количество постов с каждой стены
+
+        Returns:
+            Словарь owner_id -> список постов
+        """
+        walls: Dict[int, List[Dict]] = {}
+        owner_ids = list(dict.fromkeys(owner_ids))
+        chunks = [owner_ids[start:start + EXECUTE_BATCH_SIZE]
+                  for start in range(0, len(owner_ids), EXECUTE_BATCH_SIZE)]
+
+        async def fetch_wall(owner_id: int):
+            try:
+                posts = await self._call('wall.get', owner_id=owner_id, count=count)
+                walls[owner_id] = (posts or {}).get('items', [])
+            except VKRequestError as e:
+                logger.error("Ошибка получения постов стены %s: %s", owner_id, e)
+                self._forget_owner(owner_id, e.code)
+                walls[owner_id] = []
+            except Exception as e:
+                logger.error("Ошибка получения постов стены %s: %s", owner_id, e)
+                walls[owner_id] = []
+
+        async def fetch_chunk(chunk: List[int]):
+            calls = ",".join(
+                f'API.wall.get({{"owner_id": {owner_id}, "count": {count}}})' for owner_id in chunk
+            )
+            try:
+                result = await self._call_raw('execute', code=f"return [{calls}];")
+                responses = result.get('response') or []
+            except Exception as e:
+                logger.error("Ошибка пакетного получения постов: %s", e)
+                for owner_id in chunk:
+                    await fetch_wall(owner_id)
+                return
+
+            codes = iter(self._execute_error_codes(result))
+            for owner_id, response in zip(chunk, responses):
+                if response:
+                    walls[owner_id] = response.get('items', [])
+                else:
+                    # execute возвращает false для вызова, завершившегося ошибкой
+                    code = next(codes, 0)
+                    logger.warning("Не удалось получить посты стены %s (код ошибки %s)", owner_id, code)
+                    self._forget_owner(owner_id, code)
+                    walls[owner_id] = []
+
+        # Пакеты по очереди: вызовы все равно разнесены по времени _wait_rate_limit
+        for chunk in chunks:
+            await fetch_chunk(chunk)
+        return walls
+
     def check_keywords(self, text: str, keywords: List[str]) -> List[str]:
         """
         Проверка текста на наличие ключевых слов
@@ -204,108 +622,140 @@ class VKMonitor:
         Returns:
             Список найденных ключевых слов
         """
-        if not text:
-            return []
+        self._matcher = matcher_for(self._matcher, keywords)
+        return self._matcher.find(text)
 
-        text_lower = text.lower()
-        found = []
+    def monitor_sources(self, sources: List[str], keywords: List[str],
+                        max_posts: int = 20) -> List[Match]:
+        """
+        Мониторинг источников (групп и пользователей) на наличие ключевых слов
 
-        for keyword in keywords:
-            if keyword.lower() in text_lower:
-                found.append(keyword)
+        Синхронная обертка над monitor_sources_async для вызова вне event loop.
 
-        return found
+        Args:
+            sources: Список ID или коротких имен групп/пользователей
+            keywords: Ключевые слова для поиска
+            max_posts: Максимальное количество постов для проверки
 
-    def monitor_sources(self, sources: List[str], keywords: List[str],
-                        max_posts: int = 20) -> List[Dict]:
+        Returns:
+            Список найденных совпадений
         """
-        Мониторинг источников (групп и пользователей) на наличие ключевых слов
+        async def run() -> List[Match]:
+            try:
+                return await self.monitor_sources_async(sources, keywords, max_posts)
+            finally:
+                # Сессия принадлежит временному event loop
+                await self.close()
+
+        return asyncio.run(run())
+
+    async def monitor_sources_async(self, sources: List[str], keywords: List[str],
+                                    max_posts: int = 20) -> List[Match]:
+        """
+        Асинхронный мониторинг источников (для event loop основного сервиса)
+
+        Определение источников и получение стен идут напрямую через aiohttp,
+        пакеты execute отправляются по очереди.
 
         Args:
             sources: Список ID или коротких имен групп/пользователей
             keywords: Ключевые слова для поиска
             max_posts: Максимальное количество постов для проверки
 
+        Returns:
+            Список найденных совпадений
+        """
+        # Определяем все источники и забираем все стены пакетно
+        entities = await self._resolve_entities_async(sources)
+        walls = await self.get_walls_batch_async(
+            [info['owner_id'] for info in entities.values() if info], max_posts
+        )
+        return self._collect_matches(sources, entities, walls, keywords)
+
+    def _collect_matches(self, sources: List[str], entities: Dict[str, Optional[Dict]],
+                         walls: Dict[int, List[Dict]], keywords: List[str]) -> List[Match]:
+        """
+        Поиск ключевых слов в новых постах уже полученных стен
+
+        Args:
+            sources: Источники в порядке конфигурации
+            entities: Источник -> информация о сущности (или None)
+            walls: owner_id -> список постов
+            keywords: Ключевые слова для поиска
+
         Returns:
             Список найденных совпадений
         """
         all_matches = []
+        # Ключевые слова приводятся к нижнему регистру один раз, а не на каждый пост
+        matcher = self._matcher = matcher_for(self._matcher, keywords)
 
         for source_id in sources:
             try:
-                # Получаем информацию о сущности (группа или пользователь)
-                entity_info = self.get_entity_info(source_id)
+                entity_info = entities.get(source_id)
                 if not entity_info:
-                    logger.warning(f"Источник {source_id} не найден")
+                    logger.warning("Источник %s не найден", source_id)
                     continue
 
                 entity_type = entity_info['type']
                 entity_name = entity_info['name']
                 entity_url = entity_info['url']
                 owner_id = entity_info['owner_id']
-                entity_key = str(abs(owner_id))  # Уникальный ключ для seen_posts
 
                 # Логируем тип источника
                 type_label = "Группа" if entity_type == 'group' else "Пользователь"
-                logger.info(f"Мониторинг: {type_label} '{entity_name}' (ID: {owner_id})")
+                logger.info("Мониторинг: %s '%s' (ID: %s)", type_label, entity_name, owner_id)
 
-                # Инициализируем seen_posts для источника
-                if entity_key not in self.seen_posts:
-                    self.seen_posts[entity_key] = set()
-
-                # Получаем посты со стены
-                posts = self.get_wall_posts(owner_id, max_posts)
+                posts = walls.get(owner_id, [])
 
                 if not posts:
-                    logger.debug(f"Нет постов для анализа в источнике {entity_name}")
+                    logger.debug("Нет постов для анализа в источнике %s", entity_name)
                     continue
 
-                # Ищем совпадения только в новых постах
+                # Ищем совпадения только в новых постах: их ID больше уже просмотренных
+                # (закрепленный пост идет первым, но со своим старым ID)
+                last_id = self.last_post_ids.get(owner_id, 0)
+                max_id = last_id
                 new_matches_count = 0
                 for post in posts:
-                    post_id = post.get('id')
-                    if post_id in self.seen_posts[entity_key]:
+                    post_id = post.get('id', 0)
+                    if post_id <= last_id:
                         continue
-
-                    self.seen_posts[entity_key].add(post_id)
+                    if post_id > max_id:
+                        max_id = post_id
 
                     text = post.get('text', '')
-                    found_keywords = self.check_keywords(text, keywords)
+                    found_keywords = matcher.find(text)
 
                     if found_keywords:
                         new_matches_count += 1
-                        all_matches.append({
-                            'source': 'vk',
-                            'entity_type': entity_type,  # 'group' или 'user'
-                            'group_name': entity_name,   # Для совместимости с tg_monitor
-                            'group_url': entity_url,
-                            'post_id': post_id,
-                            'owner_id': owner_id,
-                            'text': text[:300] + ('...' if len(text) > 500 else ''),
-                            'keywords': found_keywords,
-                            'date': datetime.fromtimestamp(post.get('date', 0)).strftime("%d.%m.%Y %H:%M:%S"),
-                            'url': f"https://vk.com/wall{owner_id}_{post_id}"
-                        })
+                        all_matches.append(Match(
+                            source='vk',
+                            name=entity_name,
+                            source_url=entity_url,
+                            item_id=post_id,
+                            text=truncate(text),
+                            keywords=found_keywords,
+                            date=_format_post_date(post.get('date', 0)),
+                            url=f"https://vk.com/wall{owner_id}_{post_id}",
+                            entity_type=entity_type,
+                            owner_id=owner_id
+                        ))
+
+                self.last_post_ids[owner_id] = max_id
 
                 if new_matches_count > 0:
-                    logger.info(f"Найдено {new_matches_count} новых совпадений в {type_label.lower()} '{entity_name}'")
-
-                # Ограничиваем размер seen_posts
-                if len(self.seen_posts[entity_key]) > 1000:
-                    self.seen_posts[entity_key] = set(list(self.seen_posts[entity_key])[-500:])
-
-                # Небольшая пауза между запросами
-                time.sleep(0.5)
+                    logger.info("Найдено %s новых совпадений в %s '%s'", new_matches_count, type_label.lower(), entity_name)
 
             except Exception as e:
-                logger.error(f"Ошибка при мониторинге источника {source_id}: {e}")
+                logger.error("Ошибка при мониторинге источника %s: %s", source_id, e)
                 continue
 
         return all_matches
 
     # Для обратной совместимости
     def monitor_groups(self, groups: List[str], keywords: List[str],
-                       max_posts: int = 20) -> List[Dict]:
+                       max_posts: int = 20) -> List[Match]:
         """
         Мониторинг групп на наличие ключевых слов (для обратной совместимости)
 